@@ -2,22 +2,32 @@ import sys
 import time
 
 import logging
-from arduino_iot_cloud import ArduinoCloudClient
 
+sys.path.append("lib")
+
+from services import actuator
+from services import boot_timer
+from services import checkpoint
+from services import forecaster
+from services import heartbeat
+from services import http_api
+from services import ledger
+from services import phase_balancer
 from services import watchdog
+from services import wire
 from settings import config
-from settings import secrets
-
-sys.path.append("lib")
 
 
 class EnergyManager:
 
-    def __init__(self):
+    def __init__(self, timer=None, clock=time.time, monotonic=time.monotonic):
+        self.boot_timer = timer or boot_timer.BootTimer()
+        self.clock = clock  # time source of control decisions, replaced by simulations
+        self.monotonic = monotonic  # time source of the watchdog, not affected by changes of the system clock
+        self.client = None
         self.init_states()
         self.init_devices()
-        self.init_client()
-        self.setup_client()
+        self.restore_checkpoint()
 
     def __str__(self):
         return self.__class__.__name__
@@ -40,18 +50,66 @@ class EnergyManager:
         }
         self.energy_balance = 0
         self.power_of_heaters = 0
+        self.grid_meter_events = 0
+        self.phase_surplus = {"L1": 0.0, "L2": 0.0, "L3": 0.0}
+        self.phase_surplus_sum = 0.0
+        self.phase_surplus_count = 0
 
     def init_devices(self):
         logging.info(f"[{str(self)}] - init_devices")
         self.heaters = config.Heaters()
         self.validator = config.Validator()
         self.constants = config.Constants()
-        self.secrets = secrets.Secrets()
-        self.watchdog = watchdog.Watchdog()
+        self.watchdog = watchdog.Watchdog(
+            heartbeat.Heartbeat(self.constants.HEARTBEAT_TIMEOUT, self.constants.HEARTBEAT_QUIET_FRACTION,
+                                now=self.monotonic()), clock=self.monotonic, wait_for_cloud=True)
         self.devices = watchdog.Devices()
+        self.checkpoint = checkpoint.Checkpoint(self.constants.CHECKPOINT_PATH, self.constants.CHECKPOINT_MAX_AGE)
+        self.checkpoint_timestamp = 0.0
+        self.forecaster = forecaster.SurplusForecaster(time_constant=self.constants.FORECAST_TIME_CONSTANT)
+        self.heater_powers = {"heater_2000W": self.constants.HEATER_2000W_POWER,
+                              "heater_1000W": self.constants.HEATER_1000W_POWER,
+                              "heater_500W": self.constants.HEATER_500W_POWER}
+        self.phase_balancer = phase_balancer.PhaseBalancer(
+            heater_powers=self.heater_powers,
+            heater_phases=self.constants.HEATER_PHASES,
+            phase_import_limit=self.constants.PHASE_IMPORT_LIMIT,
+            hysteresis=self.constants.PHASE_HYSTERESIS)
+        self.ledger = ledger.EnergyLedger(self.heater_powers, self.constants.LEDGER_PATH, self.constants.LEDGER_MAX_GAP,
+                                          heaters_metered=self.heaters_metered)
+        self.ledger.load()
+        self.snapshots = http_api.SnapshotCache()
+        self.frame_sequence = wire.SequenceTracker()
+        self.actuator = actuator.RelayActuator(self.init_relays(), self.heater_powers,
+                                               min_on_time=self.constants.RELAY_MIN_ON_TIME,
+                                               min_off_time=self.constants.RELAY_MIN_OFF_TIME,
+                                               ack_timeout=self.constants.RELAY_ACK_TIMEOUT, clock=self.clock)
+
+    def init_relays(self):
+        if self.constants.ACTUATOR_BACKEND == "gpio":
+            return actuator.GpioRelays(self.constants.RELAY_PINS, self.constants.RELAY_ACTIVE_LOW)
+        if self.constants.ACTUATOR_BACKEND == "simulated":
+            return actuator.SimulatedRelays()
+        return actuator.RemoteRelays()
+
+    @property
+    def heaters_metered(self):
+        """Heaters switched by real relays are seen by the grid meter, simulated ones are not"""
+        return self.constants.ACTUATOR_BACKEND != "simulated"
+
+    def heater_independent_surplus(self):
+        """Surplus [W] from the last energy diffs without the power of heaters"""
+        surplus = self.energy_reverse_diff - self.energy_forward_diff
+        if self.heaters_metered:
+            surplus += self.power_of_heaters
+        return surplus
 
     def init_client(self):
         logging.info(f"[{str(self)}] - init_client")
+        # deferred, the control loop is already running while the cloud client is imported and connected
+        from arduino_iot_cloud import ArduinoCloudClient
+        from settings import secrets
+        self.secrets = secrets.Secrets()
         self.client = ArduinoCloudClient(device_id=self.secrets.DEVICE_ID, username=self.secrets.DEVICE_ID,
                                          password=self.secrets.SECRET_KEY)
 
@@ -60,6 +118,7 @@ class EnergyManager:
         self.client.register("energy_forward_diff", value=None, on_write=self.read_energy_forward_diff)
         self.client.register("energy_reverse_diff", value=None, on_write=self.read_energy_reverse_diff)
         self.client.register("grid_meter_frame", value=None, on_write=self.read_grid_meter_frame)
+        self.client.register("grid_meter_events", value=None, on_write=self.read_grid_meter_events)
         # self.client.register("hard_reset", value=False, on_read=self.hard_reset_grid_meter, interval=30)
         self.client.register("energy_balance", value=0, on_read=self.update_energy_balance, interval=5)
         self.client.register("power_of_heaters", value=0, on_read=self.update_power_of_heaters, interval=5)
@@ -80,6 +139,14 @@ class EnergyManager:
                              on_read=self.update_wdg_controller_gridmeter, interval=1)
         self.client.register("wdg_gridmeter_controller", value=False,
                              on_write=self.check_wdg_gridmeter_controller)
+        self.actuator.backend.register(self.client)
+
+    def start_client(self):
+        """Creates, registers and starts the cloud client, blocking - run in its own thread"""
+        self.init_client()
+        self.setup_client()
+        self.boot_timer.mark("cloud_client")
+        self.client.start()
 
     @staticmethod
     def parse_string_to_dict(input_string):  # create unit tests
@@ -108,7 +175,26 @@ class EnergyManager:
         # logging.info(f"[GRIDMETER] parse_string_to_dict -> ( output_dict) {result}")
         return result
 
+    def decode_grid_meter_frame(self, value):
+        """Text frame "key:value;..." or base64 binary frame (without ':'), None for an invalid or old frame"""
+        if ":" in value or not value:
+            return self.parse_string_to_dict(value)
+        try:
+            boot_id, sequence, timestamp, frame = wire.decode_frame(value)
+        except ValueError as e:
+            logging.error(f"[GRIDMETER] Invalid binary frame {value}: {e}")
+            return None
+        if not self.frame_sequence.accept(sequence, boot_id):
+            logging.warning(f"[GRIDMETER] Old frame {sequence} dropped, last: {self.frame_sequence.last}")
+            return None
+        logging.debug(f"[GRIDMETER] Frame {sequence} from {timestamp}, lost: {self.frame_sequence.lost}")
+        return frame
+
     def update_wdg_controller_gridmeter(self, client):
+        if self.watchdog.update_connection(client):
+            self.boot_timer.mark("cloud_connected")
+        if not self.watchdog.heartbeat_due():
+            return None
         self.watchdog.wdg_int_ext = not self.watchdog.wdg_int_ext
         return self.watchdog.wdg_int_ext
 
@@ -116,14 +202,17 @@ class EnergyManager:
         self.watchdog.wdg_ext_int = value
         self.watchdog.wdg_ext_int_timestamp = time.time()
         self.watchdog.wdg_ext_int_counter += 1
+        self.watchdog.message_received()
         self.devices.gridmeter_alive = True
 
     def read_energy_forward_diff(self, client, value):
+        self.watchdog.message_received()
         self.energy_forward_diff = value
         self.validator.energy_read = True
         logging.info(f"[GRIDMETER] Value of energy_forward_diff updated to: {self.energy_forward_diff:>6}")
 
     def read_energy_reverse_diff(self, client, value):
+        self.watchdog.message_received()
         self.energy_reverse_diff = value
         self.validator.energy_read = True
         logging.info(f"[GRIDMETER] Value of energy_reverse_diff updated to: {self.energy_reverse_diff:>6}")
@@ -156,9 +245,26 @@ class EnergyManager:
         return self.grid_meter_frame['L3_active_power']
 
     def read_grid_meter_frame(self, client, value):
+        self.watchdog.message_received()
         if self.devices.gridmeter_alive:
-            self.grid_meter_frame = self.parse_string_to_dict(value)
+            frame = self.decode_grid_meter_frame(value)
+            if frame is None:
+                return
+            self.grid_meter_frame = frame
             logging.debug(self.grid_meter_frame)
+            self.update_phase_surplus()
+            self.validator.grid_meter_frame = True
+            self.snapshots.update("frame", self.grid_meter_frame)
+            if "first_frame" not in self.boot_timer.stages:
+                self.boot_timer.mark("first_frame")
+                self.boot_timer.report()
+
+    def read_grid_meter_events(self, client, value):
+        """Bitmask of anomalies detected by the grid meter, its bad samples are already kept out of the frame"""
+        self.watchdog.message_received()
+        self.grid_meter_events = int(value)  # the cloud may deliver an integer property as float
+        if self.grid_meter_events:
+            logging.warning(f"[GRIDMETER] Events: {self.grid_meter_events:#04x}")
 
     def hard_reset_grid_meter(self, client):
         if self.state_of_grid_meter == 0:
@@ -170,14 +276,59 @@ class EnergyManager:
     def update_energy_balance(self, client):
         if self.validator.energy_read:
             if self.energy_reverse_diff >= 0 and self.energy_forward_diff >= 0:
-                # self.energy_balance = int(self.energy_reverse_diff - self.energy_forward_diff)  # in case real heaters
-                self.energy_balance = int((self.energy_reverse_diff - self.energy_forward_diff) - self.power_of_heaters)
+                surplus = self.heater_independent_surplus()
+                self.energy_balance = int(surplus - self.power_of_heaters)
+                self.forecaster.add_surplus(self.clock(), surplus)
+                if self.constants.CONTROL_MODE == "phase":  # only phase mode decides from the phase powers
+                    self.cross_check_phase_power(surplus)
                 self.validator.energy_balance = True
                 self.validator.energy_read = False
                 return self.energy_balance
             else:
                 return -1
 
+    def update_phase_surplus(self):
+        """Heater-independent surplus per phase from instantaneous active power"""
+        self.phase_surplus = self.phase_balancer.phase_surplus(self.grid_meter_frame, self.constants.PHASE_POWER_SIGN)
+        if self.heaters_metered:
+            self.phase_surplus = self.phase_balancer.without_heaters(
+                self.phase_surplus, {heater: getattr(self.heaters, heater) for heater in self.heater_powers})
+        self.phase_surplus_sum += sum(self.phase_surplus.values())
+        self.phase_surplus_count += 1
+        self.forecaster.add_phases(self.clock(), *(self.phase_surplus[phase] for phase in phase_balancer.PHASES))
+
+    def cross_check_phase_power(self, energy_surplus):
+        """Compares the mean instantaneous surplus with the surplus from energy diffs of the same interval"""
+        if not self.phase_surplus_count:
+            return
+        phase_surplus_mean = self.phase_surplus_sum / self.phase_surplus_count
+        self.phase_surplus_sum = 0.0
+        self.phase_surplus_count = 0
+        self.validator.phase_power = (abs(phase_surplus_mean - energy_surplus) <=
+                                      self.constants.PHASE_CROSS_CHECK_TOLERANCE)
+        if not self.validator.phase_power:
+            logging.warning(f"[ENERGY MANAGEMENT] Phase power cross-check failed: {phase_surplus_mean:>8.0f} "
+                            f"vs energy diffs {energy_surplus:>6}")
+
+    def adjust_heaters_per_phase(self):
+        """Heaters adjust from instantaneous per-phase power, every heater balances export of its own phase"""
+        heaters = {
+            "heater_2000W": self.heaters.heater_2000W,
+            "heater_1000W": self.heaters.heater_1000W,
+            "heater_500W": self.heaters.heater_500W
+        }
+        phase_surplus = self.forecast_phase_surplus()
+        selected = self.phase_balancer.select(phase_surplus, heaters)
+        for heater, state in selected.items():
+            setattr(self.heaters, heater, state)
+        self.update_power_of_heaters_total()
+        self.energy_balance = int(sum(phase_surplus.values()) - self.power_of_heaters)
+        self.validator.grid_meter_frame = False
+        logging.info(f"[ENERGY MANAGEMENT] adjust_heaters_per_phase: {phase_surplus} "
+                     f"| HEATER_500W: {self.heaters.heater_500W} | "
+                     f"HEATER_1000W: {self.heaters.heater_1000W} | "
+                     f"HEATER_2000W: {self.heaters.heater_2000W} |")
+
     def update_power_of_heaters_total(self):
         total_power = 0
         heaters = {
@@ -192,14 +343,64 @@ class EnergyManager:
         self.power_of_heaters = total_power
         self.validator.power_of_heaters = True
 
+    def update_ledger(self):
+        """Integrates heater powers and energy diffs held since the previous control step"""
+        powers = [power if getattr(self.heaters, heater) else 0 for heater, power in self.heater_powers.items()]
+        self.ledger.record(self.clock(), powers, self.energy_forward_diff, self.energy_reverse_diff)
+
+    def update_snapshots(self):
+        """State served by the local HTTP API, serialised again only when it changed"""
+        self.snapshots.update("frame", self.grid_meter_frame)
+        self.snapshots.update("balance", {
+            "energy_balance": self.energy_balance,
+            "power_of_heaters": self.power_of_heaters,
+            "energy_forward_diff": self.energy_forward_diff,
+            "energy_reverse_diff": self.energy_reverse_diff
+        })
+        self.snapshots.update("heaters", {heater: getattr(self.heaters, heater) for heater in self.heater_powers})
+        self.snapshots.update("watchdog", {
+            "gridmeter_alive": self.devices.gridmeter_alive,
+            "executor_alive": self.devices.executor_alive,
+            "grid_meter_events": self.grid_meter_events
+        })
+
+    def start_api(self):
+        """Local read-only HTTP API, blocking - run in its own thread"""
+        server = http_api.create_server(self.snapshots, self.constants.HTTP_API_HOST, self.constants.HTTP_API_PORT)
+        logging.info(f"[{str(self)}] - HTTP API on port {server.server_address[1]}")
+        server.serve_forever()
+
     def update_power_of_heaters(self, client):
         if self.validator.power_of_heaters:
             self.validator.power_of_heaters = False
             return self.power_of_heaters
 
+    def forecast_energy_balance(self):
+        """Energy balance expected over the next control interval, the last balance when no forecast is available"""
+        if not self.constants.FORECAST_ENABLED:
+            return self.energy_balance
+        surplus = self.forecaster.predict_surplus(self.clock() + self.constants.FORECAST_HORIZON)
+        if surplus is None:
+            return self.energy_balance
+        energy_balance = int(surplus - self.power_of_heaters)
+        logging.info(f"[ENERGY MANAGEMENT] Forecast of energy balance: {energy_balance:>6} "
+                     f"(last: {self.energy_balance:>6})")
+        return energy_balance
+
+    def forecast_phase_surplus(self):
+        """Surplus per phase expected over the next control interval, the last one when no forecast is available"""
+        if not self.constants.FORECAST_ENABLED:
+            return self.phase_surplus
+        surplus = self.forecaster.predict_phases(self.clock() + self.constants.PHASE_FORECAST_HORIZON)
+        if surplus is None:
+            return self.phase_surplus
+        phase_surplus = dict(zip(phase_balancer.PHASES, surplus))
+        logging.info(f"[ENERGY MANAGEMENT] Forecast of phase surplus: {phase_surplus} (last: {self.phase_surplus})")
+        return phase_surplus
+
     def adjust_heaters(self):  # TODO create unit tests
         """Heaters adjust used for proper turning on heaters and tweak to current production of energy"""
-        energy_balance_local = self.energy_balance
+        energy_balance_local = self.forecast_energy_balance()
         power_of_heaters_local = self.power_of_heaters
 
         logging.info(f"[ENERGY MANAGEMENT] Start of adjust_heaters with parameters: "
@@ -220,16 +421,35 @@ class EnergyManager:
                      f"HEATER_1000W: {self.heaters.heater_1000W} | "
                      f"HEATER_2000W: {self.heaters.heater_2000W} |")
 
-        self.validate_energy_balance()
-
         self.update_power_of_heaters_total()
 
         return 0
 
+    def actuate_heaters(self, adjusted=False):
+        """Sends the heater states to the relays, called every control step so that unacknowledged commands
+        are repeated. Heaters held by the minimum on/off time keep their state, the balance computed
+        by the adjust of this step (adjusted) is corrected for them."""
+        desired = {heater: getattr(self.heaters, heater) for heater in self.heater_powers}
+        commanded = self.actuator.apply(desired)
+        held = False
+        for heater, state in commanded.items():
+            if state != desired[heater]:
+                setattr(self.heaters, heater, state)
+                held = True
+                if adjusted:
+                    self.energy_balance += self.heater_powers[heater] * (desired[heater] - state)
+                logging.info(f"[ACTUATOR] {heater} held {'on' if state else 'off'} by minimum switching time")
+        if held:
+            self.update_power_of_heaters_total()
+        self.devices.executor_alive = self.actuator.alive
+        if not self.devices.executor_alive:
+            logging.warning(f"[ACTUATOR] Executor not responding: {self.actuator.metrics}")
+
     def activate_heaters(self, energy_balance_local, power_of_heaters_local):
         """Heater activation logic."""
-        if energy_balance_local >= 500 and self.validator.energy_balance:
-            if ((energy_balance_local + power_of_heaters_local) / 2000) >= 1 and not self.heaters.heater_2000W:
+        if energy_balance_local >= self.constants.ACTIVATION_THRESHOLD and self.validator.energy_balance:
+            if (((energy_balance_local + power_of_heaters_local) / self.constants.HEATER_2000W_POWER) >= 1 and not
+                    self.heaters.heater_2000W):
                 energy_balance_local -= self.constants.HEATER_2000W_POWER
                 power_of_heaters_local += self.constants.HEATER_2000W_POWER
                 self.heaters.heater_2000W = True
@@ -250,28 +470,29 @@ class EnergyManager:
         while energy_balance_local < 0 and self.validator.energy_balance:
             # HEATER 2000W
             if self.heaters.heater_2000W:
-                if (energy_balance_local / -self.constants.HEATER_2000W_POWER) > 0.75:
+                if (energy_balance_local / -self.constants.HEATER_2000W_POWER) > self.constants.HEATER_2000W_OFF_HIGH:
                     energy_balance_local += self.constants.HEATER_2000W_POWER
                     self.heaters.heater_2000W = False
                     continue
-                elif 0.25 < (energy_balance_local / -self.constants.HEATER_2000W_POWER) <= 0.75 \
+                elif self.constants.HEATER_2000W_OFF_LOW < (energy_balance_local / -self.constants.HEATER_2000W_POWER) \
+                        <= self.constants.HEATER_2000W_OFF_HIGH \
                         and not self.heaters.heater_1000W:
                     energy_balance_local += self.constants.HEATER_2000W_POWER
                     self.heaters.heater_2000W = False
                     continue
-                elif 0 < (energy_balance_local / -self.constants.HEATER_2000W_POWER) <= 0.25 \
-                        and not self.heaters.heater_500W:
+                elif 0 < (energy_balance_local / -self.constants.HEATER_2000W_POWER) \
+                        <= self.constants.HEATER_2000W_OFF_LOW and not self.heaters.heater_500W:
                     energy_balance_local += self.constants.HEATER_2000W_POWER
                     self.heaters.heater_2000W = False
                     continue
             # HEATER 1000W
             if self.heaters.heater_1000W:
-                if (energy_balance_local / -self.constants.HEATER_1000W_POWER) > 0.5:
+                if (energy_balance_local / -self.constants.HEATER_1000W_POWER) > self.constants.HEATER_1000W_OFF:
                     energy_balance_local += self.constants.HEATER_1000W_POWER
                     self.heaters.heater_1000W = False
                     continue
-                elif 0 < (energy_balance_local / -self.constants.HEATER_1000W_POWER) <= 0.5 \
-                        and not self.heaters.heater_500W:
+                elif 0 < (energy_balance_local / -self.constants.HEATER_1000W_POWER) \
+                        <= self.constants.HEATER_1000W_OFF and not self.heaters.heater_500W:
                     energy_balance_local += self.constants.HEATER_1000W_POWER
                     self.heaters.heater_1000W = False
                     continue
@@ -296,15 +517,94 @@ class EnergyManager:
             elif self.energy_balance < 0 and not any(heaters):
                 self.validator.energy_balance = False
 
+    def checkpoint_state(self):
+        return {
+            "heaters": {
+                "heater_2000W": self.heaters.heater_2000W,
+                "heater_1000W": self.heaters.heater_1000W,
+                "heater_500W": self.heaters.heater_500W
+            },
+            # only flags which hold a bool, e.g. the (False,) defaults of Validator would be restored as True
+            "validator": {flag: value for flag, value in vars(self.validator).items()
+                          if flag in ("energy_read", "energy_balance", "power_of_heaters") and isinstance(value, bool)},
+            "energy_forward_diff": self.energy_forward_diff,
+            "energy_reverse_diff": self.energy_reverse_diff,
+            "energy_balance": self.energy_balance,
+            "power_of_heaters": self.power_of_heaters,
+            "grid_meter_frame": self.grid_meter_frame
+        }
+
+    def save_checkpoint(self):
+        """Periodic warm-start checkpoint of heaters, validator flags, balance and frame, open day of the ledger"""
+        if time.time() - self.checkpoint_timestamp < self.constants.CHECKPOINT_INTERVAL:
+            return
+        try:
+            self.checkpoint.save(self.checkpoint_state())
+            self.checkpoint_timestamp = time.time()
+        except (OSError, TypeError, ValueError) as e:
+            logging.error(f"[CHECKPOINT] Saving failed: {e}")
+        try:
+            self.ledger.save()
+        except OSError as e:
+            logging.error(f"[LEDGER] Saving of the open day failed: {e}")
+
+    @staticmethod
+    def checkpoint_flag(value):
+        if not isinstance(value, bool):
+            raise TypeError(f"flag {value!r} is not a bool")
+        return value
+
+    def restore_checkpoint(self):
+        state = self.checkpoint.load()
+        if state is None:
+            logging.info(f"[{str(self)}] - cold start")
+            return
+        try:
+            for heater, value in state["heaters"].items():
+                setattr(self.heaters, heater, self.checkpoint_flag(value))
+            for flag, value in state["validator"].items():
+                setattr(self.validator, flag, self.checkpoint_flag(value))
+            self.energy_forward_diff = state["energy_forward_diff"]
+            self.energy_reverse_diff = state["energy_reverse_diff"]
+            self.energy_balance = state["energy_balance"]
+            self.power_of_heaters = state["power_of_heaters"]
+            self.grid_meter_frame.update(state["grid_meter_frame"])
+        except (KeyError, AttributeError, TypeError) as e:
+            logging.error(f"[CHECKPOINT] Invalid checkpoint, cold start: {e}")
+            self.init_states()
+            self.heaters.reset_heaters()
+            self.validator = config.Validator()
+            return
+        logging.info(f"[{str(self)}] - warm start from checkpoint: {state}")
+
+    def energy_management_step(self):
+        """One pass of the energy management loop, the adjust only sets the desired heater states"""
+        adjusted = None
+        if self.devices.gridmeter_alive:
+            logging.info(f"[ENERGY MANAGEMENT] GRIDMETER IS ALIVE")
+            if self.constants.CONTROL_MODE == "phase" and self.validator.phase_power:
+                if self.validator.grid_meter_frame:
+                    self.adjust_heaters_per_phase()
+                    adjusted = "phase"
+            elif self.validator.energy_balance:
+                logging.info(f"[ENERGY MANAGEMENT] ENERGY BALANCE VALUE IS VALID")
+                self.adjust_heaters()
+                adjusted = "energy"
+            else:
+                logging.info(f"[ENERGY MANAGEMENT] ENERGY BALANCE VALUE IS NOT VALID")
+        else:
+            logging.info(f"[ENERGY MANAGEMENT] GRIDMETER IS DEAD")
+            # surplus is unknown, heaters are switched off
+            self.heaters.reset_heaters()
+            self.update_power_of_heaters_total()
+        self.actuate_heaters(adjusted is not None)
+        if adjusted == "energy":
+            self.validate_energy_balance()
+        self.update_ledger()
+        self.update_snapshots()
+
     def run_energy_management(self):
         while True:
-            if self.devices.gridmeter_alive:
-                logging.info(f"[ENERGY MANAGEMENT] GRIDMETER IS ALIVE")
-                if self.validator.energy_balance:
-                    logging.info(f"[ENERGY MANAGEMENT] ENERGY BALANCE VALUE IS VALID")
-                    self.adjust_heaters()
-                else:
-                    logging.info(f"[ENERGY MANAGEMENT] ENERGY BALANCE VALUE IS NOT VALID")
-            else:
-                logging.info(f"[ENERGY MANAGEMENT] GRIDMETER IS DEAD")
+            self.energy_management_step()
+            self.save_checkpoint()
             time.sleep(30)
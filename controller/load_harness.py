@@ -0,0 +1,144 @@
+import argparse
+import logging
+import statistics
+import time
+
+from energy_manager import EnergyManager
+from services.actuator import RelayActuator, SimulatedRelays
+from services.cloud_loopback import LoopbackCloud
+from services.heartbeat import Heartbeat
+from services.ledger import EnergyLedger
+from services.heater_simulator import synthetic_trace
+
+
+class SimulatedGridMeter:
+    """Grid meter board: the same cloud properties as grid_meter/main.py, readings from a surplus trace"""
+
+    def __init__(self, cloud, thing, seed, days=1, step=30):
+        self.cloud = cloud
+        self.step = step
+        self.surplus = synthetic_trace(days=days, step=step, seed=seed)
+        self.wdg_gridmeter_controller = False
+        self.heartbeat = Heartbeat(10, 0.3, now=cloud.now)
+        self.client = cloud.client(thing, f"gridmeter-{thing}")
+        self.client.register("grid_meter_frame", value="", on_read=self.update_frame_cloud, interval=30.0)
+        self.client.register("energy_forward_diff", value=0, on_read=self.update_energy_forward_diff, interval=120)
+        self.client.register("energy_reverse_diff", value=0, on_read=self.update_energy_reverse_diff, interval=120)
+        self.client.register("wdg_gridmeter_controller", value=False, on_read=self.update_wdg_gridmeter_controller,
+                             interval=1)
+        self.client.register("wdg_controller_gridmeter", value=False, on_write=self.check_wdg_controller_gridmeter)
+
+    def read_surplus(self, interval=None):
+        """Reading of the meter, mean over the interval [s] before now, the reading time is sent as trace"""
+        self.client.trace = self.cloud.now
+        self.heartbeat.sent(self.cloud.now)
+        end = int(self.cloud.now / self.step)
+        steps = max(int((interval or self.step) / self.step), 1)
+        return float(sum(self.surplus[(end - i) % len(self.surplus)] for i in range(steps)) / steps)
+
+    def update_frame_cloud(self, client):
+        phase_power = -self.read_surplus() / 3
+        frame = ""
+        for phase in ("L1", "L2", "L3"):
+            frame += f"{phase}_voltage:230.0;{phase}_current:{abs(phase_power) / 230:.2f};"
+            frame += f"{phase}_active_power:{phase_power:.2f};"
+        return frame
+
+    def update_energy_forward_diff(self, client):
+        return int(max(-self.read_surplus(120), 0))
+
+    def update_energy_reverse_diff(self, client):
+        return int(max(self.read_surplus(120), 0))
+
+    def update_wdg_gridmeter_controller(self, client):
+        if not self.heartbeat.due(self.cloud.now):
+            return None
+        self.wdg_gridmeter_controller = not self.wdg_gridmeter_controller
+        return self.wdg_gridmeter_controller
+
+    def check_wdg_controller_gridmeter(self, client, value):
+        self.heartbeat.received(self.cloud.now)
+
+
+class SimulatedController(EnergyManager):
+    """EnergyManager on a loopback client, measuring latency from meter reading to heater decision"""
+
+    def __init__(self, cloud, thing):
+        self.cloud = cloud
+        self.latencies = []
+        super().__init__(clock=cloud.time, monotonic=cloud.time)
+        self.client = cloud.client(thing, f"controller-{thing}")
+        self.setup_client()
+
+    def init_devices(self):
+        super().init_devices()
+        self.constants.ACTUATOR_BACKEND = "simulated"  # the simulated meter does not see the heaters
+        self.ledger = EnergyLedger(self.ledger.heaters, path=None)
+        self.actuator = RelayActuator(SimulatedRelays(), self.heater_powers,
+                                      min_on_time=self.constants.RELAY_MIN_ON_TIME,
+                                      min_off_time=self.constants.RELAY_MIN_OFF_TIME, clock=self.clock)
+
+    def restore_checkpoint(self):
+        pass
+
+    def adjust_heaters(self):
+        trace = self.client.delivered_traces.get("energy_reverse_diff")
+        if trace is not None:
+            self.latencies.append(self.cloud.now - trace)
+        return super().adjust_heaters()
+
+
+def run_load_test(pairs=20, duration=3600, latency=0.2, jitter=0.5, drop_rate=0.0, reorder_rate=0.0, start=43200):
+    cloud = LoopbackCloud(latency=latency, jitter=jitter, drop_rate=drop_rate, reorder_rate=reorder_rate,
+                          start=start)
+    controllers = []
+    for pair in range(pairs):
+        meter = SimulatedGridMeter(cloud, pair, seed=pair)
+        controller = SimulatedController(cloud, pair)
+        meter.client.start()
+        controller.client.start()
+        cloud.every(30, controller.energy_management_step)
+        controllers.append(controller)
+
+    start = time.perf_counter()
+    events = cloud.run(duration)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for controller in controllers for latency in controller.latencies)
+    return {
+        "pairs": pairs,
+        "simulated_s": duration,
+        "wall_s": elapsed,
+        "speedup": duration / elapsed,
+        "events": events,
+        "callbacks_per_s": cloud.stats["callbacks"] / elapsed,
+        "messages": cloud.stats["published"],
+        "dropped": cloud.stats["dropped"],
+        "decisions": len(latencies),
+        "latency_p50_s": statistics.median(latencies) if latencies else None,
+        "latency_p95_s": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        "latency_max_s": latencies[-1] if latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of grid meter and controller pairs "
+                                                 "on a local cloud stand-in")
+    parser.add_argument("--pairs", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--reorder-rate", type=float, default=0.0)
+    parser.add_argument("--start", type=float, default=43200, help="simulated time of day at start [s]")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = run_load_test(args.pairs, args.duration, args.latency, args.jitter, args.drop_rate, args.reorder_rate,
+                           args.start)
+    for key, value in result.items():
+        print(f"{key:<16} {value:.3f}" if isinstance(value, float) else f"{key:<16} {value}")
+
+
+if __name__ == "__main__":
+    main()
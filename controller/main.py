@@ -1,28 +1,36 @@
 import sys
 
+sys.path.append("lib")
+
 import logging
-import time
 from threading import Thread
 
-from energy_manager import EnergyManager
+from services.boot_timer import BootTimer
 
-sys.path.append("lib")
+boot_timer = BootTimer()
+
+from energy_manager import EnergyManager
 
 
 def main():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    energy_manager = EnergyManager()
+    boot_timer.mark("imports")
+    energy_manager = EnergyManager(boot_timer)
+    boot_timer.mark("energy_manager")
 
     adjust_heaters_thread = Thread(target=energy_manager.run_energy_management)
     adjust_heaters_thread.start()
     watchdog_gridmeter_thread = Thread(target=energy_manager.watchdog.run_watchdog, args=(energy_manager.devices,))
     watchdog_gridmeter_thread.start()
+    if energy_manager.constants.HTTP_API_ENABLED:
+        api_thread = Thread(target=energy_manager.start_api, daemon=True)
+        api_thread.start()
+    boot_timer.mark("control_loop")
 
-    # energy_manager.client.start()
-    client_start = Thread(target=energy_manager.client.start)
+    # cloud client is imported, created and connected concurrently with the control loop
+    client_start = Thread(target=energy_manager.start_client)
     client_start.start()
 
 
-
 if __name__ == "__main__":
     main()
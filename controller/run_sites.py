@@ -0,0 +1,121 @@
+import sys
+
+sys.path.append("lib")
+
+import argparse
+import asyncio
+import importlib.metadata
+import json
+import logging
+import time
+from threading import Thread
+
+from services.actuator import RelayActuator, RemoteRelays
+from services.heartbeat import Heartbeat
+from services.multi_site import HEATER_NAMES, MultiSiteController
+from services.watchdog import Watchdog
+from settings import config
+
+# client.run() is the coroutine behind ArduinoCloudClient.start() in async mode, which is not a public API,
+# so the library is pinned: pip install "arduino-iot-cloud>=1.4,<1.5"
+CLOUD_LIBRARY_VERSION = "1.4"
+
+
+def load_sites(path):
+    """Sites from a JSON file: [{"name": ..., "device_id": ..., "secret_key": ...}, ...]"""
+    with open(path) as file:
+        return json.load(file)
+
+
+def published(watchdog, on_read):
+    """on_read callback which marks the heartbeat as sent, the cloud client publishes every value except None"""
+    def read(client):
+        value = on_read(client)
+        if value is not None:
+            watchdog.message_sent()
+        return value
+    return read
+
+
+def create_client(site, controller, relays, constants):
+    """Cloud client of one site, its callbacks only store values in the arrays of the controller"""
+    from arduino_iot_cloud import ArduinoCloudClient
+    name = site["name"]
+    # liveness of the grid meter is tracked by the controller, the heartbeat only paces the explicit watchdog signal
+    watchdog = Watchdog(Heartbeat(constants.HEARTBEAT_TIMEOUT, constants.HEARTBEAT_QUIET_FRACTION,
+                                  now=time.monotonic()), clock=time.monotonic, wait_for_cloud=True)
+
+    def update_wdg_controller_gridmeter(client):
+        watchdog.update_connection(client)
+        if not watchdog.heartbeat_due():
+            return None
+        watchdog.wdg_int_ext = not watchdog.wdg_int_ext
+        return watchdog.wdg_int_ext
+
+    client = ArduinoCloudClient(device_id=site["device_id"], username=site["device_id"],
+                                password=site["secret_key"])
+    client.register("energy_forward_diff", value=None,
+                    on_write=lambda client, value: controller.read_energy_forward_diff(name, value))
+    client.register("energy_reverse_diff", value=None,
+                    on_write=lambda client, value: controller.read_energy_reverse_diff(name, value))
+    client.register("grid_meter_frame", value=None,
+                    on_write=lambda client, value: controller.read_grid_meter_frame(name))
+    client.register("energy_balance", value=0, interval=5,
+                    on_read=published(watchdog, lambda client: int(controller.energy_balance[controller.index[name]])))
+    client.register("power_of_heaters", value=0, interval=5,
+                    on_read=published(watchdog, lambda client: controller.power_of_heaters(name)))
+    client.register("wdg_controller_gridmeter", value=False, on_read=update_wdg_controller_gridmeter, interval=1)
+    client.register("wdg_gridmeter_controller", value=False,
+                    on_write=lambda client, value: controller.check_wdg_gridmeter_controller(name))
+    relays.register(client)
+    return client
+
+
+def run_control(controller, interval):
+    while True:
+        start = time.perf_counter()
+        changed = controller.step()
+        logging.info(f"[MULTI SITE] {len(controller.sites)} sites in {(time.perf_counter() - start) * 1000:.1f} ms, "
+                     f"changed: {[controller.sites[index] for index in changed]}")
+        time.sleep(interval)
+
+
+def check_cloud_library():
+    version = importlib.metadata.version("arduino-iot-cloud")
+    if version.split(".")[:2] != CLOUD_LIBRARY_VERSION.split("."):
+        raise RuntimeError(f"arduino-iot-cloud {version} is not supported, {CLOUD_LIBRARY_VERSION}.x is required")
+
+
+async def run_clients(clients):
+    # all clients share one event loop instead of a thread per site
+    await asyncio.gather(*(client.run(1.0, 1.2) for client in clients))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One controller process for many meter/heater sites")
+    parser.add_argument("sites", help="JSON file with name, device_id and secret_key of every site")
+    parser.add_argument("--interval", type=float, default=30, help="seconds between two decisions")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    check_cloud_library()
+    constants = config.Constants()
+    sites = load_sites(args.sites)
+    relays = [RemoteRelays() for _ in sites]
+    actuators = [RelayActuator(backend, HEATER_NAMES, min_on_time=constants.RELAY_MIN_ON_TIME,
+                               min_off_time=constants.RELAY_MIN_OFF_TIME, ack_timeout=constants.RELAY_ACK_TIMEOUT,
+                               clock=time.time) for backend in relays]
+    controller = MultiSiteController([site["name"] for site in sites], actuators,
+                                     watchdog_timeout=constants.HEARTBEAT_TIMEOUT, heaters_metered=True,
+                                     activation_threshold=constants.ACTIVATION_THRESHOLD,
+                                     heater_2000w_off_high=constants.HEATER_2000W_OFF_HIGH,
+                                     heater_2000w_off_low=constants.HEATER_2000W_OFF_LOW,
+                                     heater_1000w_off=constants.HEATER_1000W_OFF)
+    clients = [create_client(site, controller, backend, constants) for site, backend in zip(sites, relays)]
+
+    Thread(target=run_control, args=(controller, args.interval), daemon=True).start()
+    asyncio.run(run_clients(clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import logging
+import math
+import time
+
+
+class SimulatedRelays:
+    """Relays of tests and simulations, every command is acknowledged at once unless respond is False"""
+
+    def __init__(self, respond=True):
+        self.respond = respond
+        self.states = {}
+        self.commands = []
+        self.on_ack = None
+
+    def register(self, client):
+        pass
+
+    def send(self, sequence, changes):
+        self.commands.append((sequence, dict(changes)))
+        if self.respond:
+            self.states.update(changes)
+            self.on_ack(sequence)
+
+
+class GpioRelays:
+    """Relays wired to GPIO pins of the controller board, RPi.GPIO is imported only when this backend is used"""
+
+    def __init__(self, pins, active_low=False):
+        # pins       - {relay name: BCM pin number}
+        # active_low - relay is on at low level of the pin
+        import RPi.GPIO as GPIO
+        self.gpio = GPIO
+        self.pins = pins
+        self.active_low = active_low
+        self.on_ack = None
+        GPIO.setmode(GPIO.BCM)
+        for pin in pins.values():
+            GPIO.setup(pin, GPIO.OUT, initial=GPIO.HIGH if active_low else GPIO.LOW)
+
+    def register(self, client):
+        pass
+
+    def send(self, sequence, changes):
+        for name, state in changes.items():
+            self.gpio.output(self.pins[name], state != self.active_low)
+        # the command is acknowledged when the pins read back the requested states
+        if all(bool(self.gpio.input(self.pins[name])) == (state != self.active_low) for name, state in changes.items()):
+            self.on_ack(sequence)
+
+
+class RemoteRelays:
+    """Relays of the executor board, driven through the cloud.
+
+    A command is one string property "seq:<n>;<relay>:<0|1>;..." with the relays to change, the executor
+    switches them and writes the sequence number back to the ack property.
+    """
+
+    def __init__(self, command_property="heaters_command", ack_property="heaters_ack"):
+        self.command_property = command_property
+        self.ack_property = ack_property
+        self.client = None
+        self.on_ack = None
+
+    def register(self, client):
+        self.client = client
+        client.register(self.command_property, value="")
+        client.register(self.ack_property, value=0, on_write=self.read_ack)
+
+    def read_ack(self, client, value):
+        self.on_ack(int(value))
+
+    @staticmethod
+    def encode(sequence, changes):
+        return f"seq:{sequence};" + "".join(f"{name}:{int(state)};" for name, state in changes.items())
+
+    def send(self, sequence, changes):
+        if self.client is None:
+            logging.warning(f"[ACTUATOR] Cloud client not ready, command {sequence} not sent")
+            return
+        self.client[self.command_property] = self.encode(sequence, changes)
+
+
+class RelayActuator:
+    """Sends the desired relay states to a backend as diffed and batched commands.
+
+    Only the relays whose desired state differs from the acknowledged one are sent, all of them in one command,
+    so a command supersedes every older one and only the last one needs an acknowledgement. A relay keeps
+    its state for at least min_on_time / min_off_time after a switch. An unacknowledged command is repeated
+    after ack_timeout, until then the executor is considered alive.
+    """
+
+    def __init__(self, backend, names, min_on_time=0.0, min_off_time=0.0, ack_timeout=10.0, clock=time.monotonic):
+        self.backend = backend
+        self.backend.on_ack = self.acknowledge
+        self.min_on_time = min_on_time
+        self.min_off_time = min_off_time
+        self.ack_timeout = ack_timeout
+        self.clock = clock
+        # state of relays at start is unknown, the first command sends all of them
+        self.commanded = {name: None for name in names}
+        self.actual = {name: None for name in names}
+        self.switched = {name: -math.inf for name in names}
+        self.sequence = 0
+        self.pending = None  # (sequence, time of sending, commanded states) of the last command
+        self.unacked_since = None
+        self.sent_timestamp = -math.inf
+        self.metrics = {"commands": 0, "relays": 0, "held": 0, "acks": 0, "retries": 0,
+                        "latency_last": None, "latency_max": 0.0, "latency_sum": 0.0}
+
+    def apply(self, desired):
+        """Commands the desired states, returns the commanded states of all relays"""
+        now = self.clock()
+        changed = False
+        for name, state in desired.items():
+            current = self.commanded[name]
+            if state == current:
+                continue
+            min_time = self.min_on_time if current else self.min_off_time
+            if current is not None and now - self.switched[name] < min_time:
+                self.metrics["held"] += 1
+                continue
+            self.commanded[name] = state
+            self.switched[name] = now
+            changed = True
+        changes = {name: state for name, state in self.commanded.items() if state != self.actual[name]}
+        if changes and (changed or now - self.sent_timestamp >= self.ack_timeout):
+            if not changed:
+                self.metrics["retries"] += 1
+                logging.warning(f"[ACTUATOR] Command {self.sequence} not acknowledged, repeated")
+            self.send(changes, now)
+        return dict(self.commanded)
+
+    def send(self, changes, now):
+        self.sequence += 1
+        self.pending = (self.sequence, now, dict(self.commanded))
+        self.sent_timestamp = now
+        if self.unacked_since is None:
+            self.unacked_since = now
+        self.metrics["commands"] += 1
+        self.metrics["relays"] += len(changes)
+        logging.info(f"[ACTUATOR] Command {self.sequence}: {changes}")
+        self.backend.send(self.sequence, changes)
+
+    def acknowledge(self, sequence):
+        # the last command contains all relays changed by older ones, late acknowledgements of them are ignored
+        if self.pending is None or sequence != self.pending[0]:
+            return
+        _, sent_timestamp, states = self.pending
+        self.pending = None
+        self.unacked_since = None
+        self.actual.update(states)
+        latency = self.clock() - sent_timestamp
+        self.metrics["acks"] += 1
+        self.metrics["latency_last"] = latency
+        self.metrics["latency_max"] = max(self.metrics["latency_max"], latency)
+        self.metrics["latency_sum"] += latency
+
+    @property
+    def alive(self):
+        """False when commands have not been acknowledged for ack_timeout"""
+        return self.unacked_since is None or self.clock() - self.unacked_since < self.ack_timeout
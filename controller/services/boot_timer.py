@@ -0,0 +1,21 @@
+import logging
+import time
+
+
+class BootTimer:
+    """Startup timing report: time of the first occurrence of every startup stage since process start"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.stages = {}
+
+    def mark(self, stage):
+        if stage in self.stages:
+            return
+        self.stages[stage] = time.monotonic() - self.start
+        logging.info(f"[BOOT] {stage:<16} {self.stages[stage] * 1000:>8.0f} ms")
+
+    def report(self):
+        summary = " | ".join(f"{stage}: {elapsed * 1000:.0f} ms" for stage, elapsed in self.stages.items())
+        logging.info(f"[BOOT] startup report - {summary}")
+        return summary
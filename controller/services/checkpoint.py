@@ -0,0 +1,40 @@
+import json
+import logging
+import os
+import time
+
+
+class Checkpoint:
+    def __init__(self, path="checkpoint.json", max_age=300):
+        # max_age - checkpoint older than this [s] is ignored and the controller starts cold
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, state):
+        """Atomic write: the state is written to a temporary file which then replaces the checkpoint"""
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, "w") as file:
+                json.dump({"timestamp": time.time(), "state": state}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.path)
+        finally:
+            # left behind only by a failed write
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def load(self):
+        """Returns the saved state when the checkpoint exists and is fresh enough, otherwise None"""
+        try:
+            with open(self.path) as file:
+                checkpoint = json.load(file)
+            age = time.time() - checkpoint["timestamp"]
+            state = checkpoint["state"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.info(f"[CHECKPOINT] No usable checkpoint: {e}")
+            return None
+        if not 0 <= age <= self.max_age:
+            logging.info(f"[CHECKPOINT] Checkpoint too old: {age:.0f} s")
+            return None
+        return state
@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import random
+
+
+class LoopbackProperty:
+    def __init__(self, name, value=None, on_read=None, on_write=None, interval=1.0):
+        self.name = name
+        self.value = value
+        self.on_read = on_read
+        self.on_write = on_write
+        self.interval = interval
+
+
+class LoopbackCloud:
+    """In-process stand-in of the Arduino cloud, running on a virtual clock.
+
+    Clients of the same thing are linked: a property published by one client is delivered to the on_write
+    callback of the same property on every other client of the thing, after a configurable latency.
+    Messages can be dropped and reordered. run() processes the events as fast as possible, so the
+    simulated time runs many times faster than real time.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, drop_rate=0.0, reorder_rate=0.0, reorder_delay=5.0, seed=0,
+                 start=0.0):
+        # latency       - [s] delay of every message
+        # jitter        - [s] random additional delay, uniform from 0 to jitter
+        # drop_rate     - probability that a message is lost
+        # reorder_rate  - probability that a message is delayed by up to reorder_delay and overtaken by later ones
+        # start         - [s] simulated time at start
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.reorder_rate = reorder_rate
+        self.reorder_delay = reorder_delay
+        self.random = random.Random(seed)
+        self.now = start
+        self.things = {}
+        self.events = []
+        self.sequence = itertools.count()
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "reordered": 0, "callbacks": 0}
+
+    def time(self):
+        return self.now
+
+    def client(self, thing, device_id=None):
+        client = LoopbackClient(self, thing, device_id)
+        self.things.setdefault(thing, []).append(client)
+        return client
+
+    def schedule(self, delay, callback, *args):
+        heapq.heappush(self.events, (self.now + delay, next(self.sequence), callback, args))
+
+    def every(self, interval, callback, *args):
+        """Calls callback(*args) every interval seconds of simulated time"""
+        def repeat():
+            callback(*args)
+            self.schedule(interval, repeat)
+        self.schedule(interval, repeat)
+
+    def publish(self, sender, name, value, trace=None):
+        self.stats["published"] += 1
+        for client in self.things[sender.thing]:
+            if client is sender or name not in client.properties or not client.properties[name].on_write:
+                continue
+            if self.random.random() < self.drop_rate:
+                self.stats["dropped"] += 1
+                continue
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if self.random.random() < self.reorder_rate:
+                self.stats["reordered"] += 1
+                delay += self.random.uniform(0, self.reorder_delay)
+            self.schedule(delay, client.deliver, name, value, trace)
+
+    def run(self, duration):
+        """Processes all events up to duration seconds from now, returns number of processed events"""
+        end = self.now + duration
+        processed = 0
+        while self.events and self.events[0][0] <= end:
+            self.now, _, callback, args = heapq.heappop(self.events)
+            callback(*args)
+            processed += 1
+        self.now = end
+        return processed
+
+
+class LoopbackClient:
+    """Replacement of ArduinoCloudClient with the same register/start API, linked through LoopbackCloud.
+
+    start() only schedules the on_read callbacks and returns, the simulation is driven by LoopbackCloud.run().
+    The client is connected from start(), thing_id is set then like by the thing discovery of the cloud client.
+    trace is an optional tag (e.g. time of a meter reading) sent with the next published values,
+    delivered_traces holds the tag of the last delivered value of every property.
+    """
+
+    def __init__(self, cloud, thing, device_id=None):
+        self.cloud = cloud
+        self.thing = thing
+        self.device_id = device_id
+        self.thing_id = None
+        self.properties = {}
+        self.trace = None
+        self.delivered_traces = {}
+
+    def register(self, name, value=None, on_read=None, on_write=None, interval=1.0, **kwargs):
+        self.properties[name] = LoopbackProperty(name, value, on_read, on_write, interval)
+
+    def start(self):
+        self.thing_id = self.thing
+        for prop in self.properties.values():
+            if prop.on_read:
+                self.cloud.schedule(0, self._read, prop)
+
+    def __getitem__(self, name):
+        return self.properties[name].value
+
+    def __setitem__(self, name, value):
+        prop = self.properties[name]
+        if value is not None:
+            prop.value = value
+            self.cloud.publish(self, name, value, self.trace)
+
+    def _read(self, prop):
+        self.cloud.stats["callbacks"] += 1
+        value = prop.on_read(self)
+        # like the cloud client, every value except None is published, changed or not
+        if value is not None:
+            prop.value = value
+            self.cloud.publish(self, prop.name, value, self.trace)
+        self.cloud.schedule(prop.interval, self._read, prop)
+
+    def deliver(self, name, value, trace=None):
+        prop = self.properties[name]
+        prop.value = value
+        self.delivered_traces[name] = trace
+        self.cloud.stats["delivered"] += 1
+        self.cloud.stats["callbacks"] += 1
+        prop.on_write(self, value)
@@ -0,0 +1,85 @@
+class TrendForecaster:
+    """Short-term forecast of one or more series by an exponentially weighted linear trend.
+
+    Samples older than a few time constants have negligible weight, so the ring buffer can hold a whole day
+    of history while the forecast follows the last minutes. One forecast is a few vectorised passes over the buffer.
+    NumPy is imported with the first sample, it is not needed on the boot path of the controller.
+    """
+
+    def __init__(self, columns=1, capacity=2880, time_constant=300.0, max_age=3600.0, min_spread=10.0):
+        # capacity      - number of kept samples, e.g. 2880 = one day of 30 s samples
+        # time_constant - [s] age at which the weight of a sample drops to 1/e
+        # max_age       - [s] no forecast when the newest sample is older than this
+        # min_spread    - [s] weighted standard deviation of sample times needed to fit a trend
+        self.np = None
+        self.timestamps = None
+        self.values = None
+        self.columns = columns
+        self.capacity = capacity
+        self.time_constant = time_constant
+        self.max_age = max_age
+        self.min_spread = min_spread
+        self.size = 0
+        self.head = 0
+
+    def allocate(self):
+        import numpy as np
+        self.np = np
+        self.timestamps = np.zeros(self.capacity)
+        self.values = np.zeros((self.capacity, self.columns))
+
+    def add(self, timestamp, values):
+        if self.np is None:
+            self.allocate()
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last_timestamp(self):
+        return self.timestamps[(self.head - 1) % self.capacity] if self.size else None
+
+    def predict(self, timestamp):
+        """Forecast of all columns at the given time, None without enough fresh history"""
+        if self.size < 2 or timestamp - self.last_timestamp() > self.max_age:
+            return None
+        age = timestamp - self.timestamps[:self.size]
+        values = self.values[:self.size]
+        weights = self.np.exp(-age / self.time_constant)
+        sum_w = weights.sum()
+        sum_wt = weights @ age
+        sum_wtt = weights @ (age * age)
+        sum_wy = weights @ values
+        sum_wty = (weights * age) @ values
+        denominator = sum_w * sum_wtt - sum_wt * sum_wt
+        if denominator < (self.min_spread * sum_w) ** 2:  # samples too close in time for a trend, weighted mean
+            return sum_wy / sum_w
+        # value = level - slope * age, evaluated at age 0 (the requested time)
+        slope = (sum_wt * sum_wy - sum_w * sum_wty) / denominator
+        return (sum_wy + slope * sum_wt) / sum_w
+
+
+class SurplusForecaster:
+    """Forecast of the heater-independent surplus from energy diff history and of the surplus of every phase"""
+
+    def __init__(self, surplus_capacity=720, phase_capacity=2880, time_constant=300.0):
+        # surplus_capacity - 720 = one day of energy diffs, which arrive every 120 s
+        # phase_capacity   - 2880 = one day of grid meter frames, which arrive every 30 s
+        self.surplus = TrendForecaster(columns=1, capacity=surplus_capacity, time_constant=time_constant)
+        self.phases = TrendForecaster(columns=3, capacity=phase_capacity, time_constant=time_constant)
+
+    def add_surplus(self, timestamp, surplus):
+        """surplus - exported minus imported power [W] without the heaters"""
+        self.surplus.add(timestamp, surplus)
+
+    def add_phases(self, timestamp, l1_surplus, l2_surplus, l3_surplus):
+        """surplus of every phase [W] without the heaters"""
+        self.phases.add(timestamp, (l1_surplus, l2_surplus, l3_surplus))
+
+    def predict_surplus(self, timestamp):
+        prediction = self.surplus.predict(timestamp)
+        return None if prediction is None else float(prediction[0])
+
+    def predict_phases(self, timestamp):
+        prediction = self.phases.predict(timestamp)
+        return None if prediction is None else [float(value) for value in prediction]
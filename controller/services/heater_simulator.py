@@ -0,0 +1,140 @@
+import itertools
+
+import numpy as np
+
+HEATER_POWERS = (2000, 1000, 500)
+
+
+class HeaterPolicy:
+    """Vectorised copy of EnergyManager.activate_heaters/deactivate_heaters.
+
+    Every element of the state array is an independent controller (one parameter combination or one site),
+    so one call performs one decision for all of them at once. The heaters of an element are the bits
+    of its state code (bit 0 - 2000 W, bit 1 - 1000 W, bit 2 - 500 W), the heater power is a table lookup
+    and the ratio thresholds are kept as deficits in W, so a decision costs a few array operations.
+    """
+
+    def __init__(self, size, activation_threshold=500, heater_2000w_off_high=0.75, heater_2000w_off_low=0.25,
+                 heater_1000w_off=0.5, heater_powers=HEATER_POWERS):
+        # thresholds - scalars or arrays of the given size
+        self.size = size
+        self.heater_powers = heater_powers
+        self.state = np.zeros(size, dtype=np.uint8)
+        codes = range(2 ** len(heater_powers))
+        self.power_table = np.array([sum(power for bit, power in enumerate(heater_powers) if code >> bit & 1)
+                                     for code in codes], dtype=float)
+        self.has_heater = [np.array([code >> bit & 1 for code in codes], dtype=bool)
+                           for bit in range(len(heater_powers))]
+        self.popcount = np.array([bin(code).count("1") for code in codes], dtype=np.int64)
+        self.activation_threshold = np.asarray(activation_threshold, dtype=float)
+        self.off_2000w_high = np.asarray(heater_2000w_off_high, dtype=float) * heater_powers[0]
+        self.off_2000w_low = np.asarray(heater_2000w_off_low, dtype=float) * heater_powers[0]
+        self.off_1000w = np.asarray(heater_1000w_off, dtype=float) * heater_powers[1]
+
+    @property
+    def heaters(self):
+        """States of heaters as bool arrays, in order of heater_powers"""
+        return [has_heater[self.state] for has_heater in self.has_heater]
+
+    def power_of_heaters(self):
+        return self.power_table[self.state]
+
+    def activation_mask(self, surplus):
+        """State bits of heaters which fit into the surplus"""
+        if np.ndim(surplus) == 0:
+            return sum(1 << bit for bit, power in enumerate(self.heater_powers) if surplus >= power)
+        mask = np.zeros(np.shape(surplus), dtype=np.uint8)
+        for bit, power in enumerate(self.heater_powers):
+            mask |= (surplus >= power).astype(np.uint8) << bit
+        return mask
+
+    def activate(self, surplus, valid=True):
+        """Same rules as activate_heaters, surplus is the heater-independent surplus (balance + heater power)"""
+        mask = self.activation_mask(surplus)
+        if np.ndim(mask) == 0 and not mask:
+            return
+        active = self.power_table[self.state] <= surplus - self.activation_threshold
+        if valid is not True:
+            active &= valid
+        np.bitwise_or(self.state, mask, out=self.state, where=active)
+
+    def deactivate(self, surplus, valid=True):
+        """Same rules as deactivate_heaters, every pass of the loop turns off at most one heater per element"""
+        has_2000w, has_1000w, has_500w = self.has_heater
+        for _ in range(len(self.heater_powers)):
+            state = self.state
+            deficit = self.power_table[state] - surplus
+            active = (deficit > 0) & (state > 0)
+            if valid is not True:
+                active &= valid
+            if not active.any():
+                break
+            heater_1000w = has_1000w[state]
+            heater_500w = has_500w[state]
+            switch_2000w = active & has_2000w[state] & (
+                    (deficit > self.off_2000w_high) |
+                    ((deficit > self.off_2000w_low) & ~heater_1000w) |
+                    ((deficit <= self.off_2000w_low) & ~heater_500w))
+            active &= ~switch_2000w
+            switch_1000w = active & heater_1000w & ((deficit > self.off_1000w) | ~heater_500w)
+            active &= ~switch_1000w
+            switch_500w = active & heater_500w
+            self.state ^= (switch_2000w.view(np.uint8) | switch_1000w.view(np.uint8) << 1 |
+                           switch_500w.view(np.uint8) << 2)
+
+    def step(self, surplus, valid=True):
+        """One decision for the heater-independent surplus [W], returns the energy balance after it"""
+        self.activate(surplus, valid)
+        self.deactivate(surplus, valid)
+        return surplus - self.power_table[self.state]
+
+
+def parameter_grid(**ranges):
+    """Cartesian product of parameter ranges, {name: array} with one element per combination"""
+    names = list(ranges)
+    combinations = np.array(list(itertools.product(*ranges.values())), dtype=float)
+    return {name: combinations[:, index] for index, name in enumerate(names)}
+
+
+def synthetic_trace(days=30, step=30, peak_power=6000, base_load=400, seed=0):
+    """Surplus [W] of a PV installation with random cloud passages and household load, one value per step"""
+    rng = np.random.default_rng(seed)
+    time_of_day = (np.arange(int(days * 86400 / step)) * step % 86400) / 3600
+    sun = np.clip(np.sin((time_of_day - 6) / 14 * np.pi), 0, None)
+    clouds = np.repeat(rng.uniform(0.3, 1.0, len(sun) // 20 + 1), 20)[:len(sun)]
+    load = base_load + rng.exponential(300, len(sun))
+    return peak_power * sun * clouds - load
+
+
+def simulate(surplus, step=30, **parameters):
+    """Runs the heater policy for every parameter combination over the surplus trace.
+
+    Heaters chosen on a reading run until the next reading. Returns arrays with one element per combination:
+    self_consumption [kWh] of surplus used by heaters, grid_import [kWh], export [kWh] and switches of relays.
+    """
+    size = max([np.size(value) for value in parameters.values()] or [1])
+    policy = HeaterPolicy(size, **parameters)
+    self_consumption = np.zeros(size)
+    heaters_energy = np.zeros(size)
+    switches = np.zeros(size, dtype=np.int64)
+    previous_state = policy.state.copy()
+    for value in np.asarray(surplus, dtype=float).tolist():
+        # energy of the interval with heaters chosen on the previous reading
+        power_of_heaters = policy.power_of_heaters()
+        heaters_energy += power_of_heaters
+        if value > 0:
+            self_consumption += np.minimum(power_of_heaters, value)
+        policy.step(value)
+        switches += policy.popcount[previous_state ^ policy.state]
+        previous_state[:] = policy.state
+    surplus = np.asarray(surplus, dtype=float)
+    # export = surplus not used by heaters, import = export - (surplus - heaters)
+    export = surplus[surplus > 0].sum() - self_consumption
+    grid_import = export - surplus.sum() + heaters_energy
+    hours = step / 3600
+    return {
+        "self_consumption": self_consumption * hours / 1000,
+        "grid_import": grid_import * hours / 1000,
+        "export": export * hours / 1000,
+        "switches": switches
+    }
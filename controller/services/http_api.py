@@ -0,0 +1,107 @@
+import copy
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MAX_WAIT = 60  # [s] longest long-poll request
+
+
+class SnapshotCache:
+    """Latest state of the controller as pre-serialised JSON documents.
+
+    update() is called by the control loop, a document is serialised again only when its value changed.
+    Every change increments the version, which is the ETag of the documents and wakes up waiting clients.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.values = {}
+        self.documents = {}
+        self.state = (0, b"{}")
+
+    def update(self, name, value):
+        with self.condition:
+            if self.values.get(name) == value:
+                return False
+            self.values[name] = copy.deepcopy(value)
+            self.version += 1
+            self.documents[name] = (self.version, json.dumps(value).encode())
+            self.state = (self.version, json.dumps(dict(self.values, version=self.version)).encode())
+            self.condition.notify_all()
+            return True
+
+    def get(self, name="state"):
+        """(version, JSON body) of a document, None for an unknown one"""
+        with self.condition:
+            return self.state if name == "state" else self.documents.get(name)
+
+    def wait(self, name, version, timeout):
+        """Blocks until the document is newer than version, returns False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.get(name)[0] > version, timeout)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Read-only API: GET /state, /<document>, long-poll with If-None-Match and ?wait=<s>, SSE on /events"""
+
+    cache = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        name = url.path.strip("/") or "state"
+        if name == "events":
+            return self.send_events()
+        document = self.cache.get(name)
+        if document is None:
+            return self.send_error(404, f"Unknown document {name}")
+        etag = self.headers.get("If-None-Match")
+        try:
+            wait = min(float(parse_qs(url.query).get("wait", ["0"])[0]), MAX_WAIT)
+        except ValueError:
+            return self.send_error(400, "wait must be a number of seconds")
+        if etag == f'"{document[0]}"' and wait > 0 and self.cache.wait(name, document[0], wait):
+            document = self.cache.get(name)
+        if etag == f'"{document[0]}"':
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(document[1])))
+        self.send_header("ETag", f'"{document[0]}"')
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(document[1])
+
+    def send_events(self):
+        """Server-sent events: the whole state on connection and after every change"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        version = -1
+        try:
+            while True:
+                if self.cache.wait("state", version, MAX_WAIT):
+                    version, body = self.cache.get()
+                    self.wfile.write(b"id: %d\ndata: %s\n\n" % (version, body))
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logging.debug(f"[HTTP API] {self.address_string()} {format % args}")
+
+
+def create_server(cache, host="0.0.0.0", port=8080):
+    """HTTP server of the cache, every request runs in its own thread - call serve_forever() in a thread"""
+    handler = type("BoundApiRequestHandler", (ApiRequestHandler,), {"cache": cache})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,210 @@
+import logging
+import os
+import struct
+import time
+
+
+class EnergyLedger:
+    """Incremental energy ledger of heaters, grid import and export.
+
+    Every record() integrates the powers held since the previous call into the totals of the current day,
+    month and year, so an update and every query are O(1). Closed days and months are appended to binary
+    rollup files (key yyyymmdd / yyyymm + one float32 [kWh] per field), the open day is kept in a file with
+    a single record rewritten by save(). These files are the only thing read on start.
+    """
+
+    def __init__(self, heaters, path="ledger", max_gap=600, heaters_metered=False):
+        # heaters         - names of heaters, in order of powers passed to record()
+        # path            - prefix of the rollup files, None keeps the rollups in memory only
+        # max_gap         - [s] longer interval between two records is treated as missing data
+        # heaters_metered - the meter sees the heaters (real relays), forward/reverse already include them
+        self.heaters = list(heaters)
+        self.heaters_metered = heaters_metered
+        self.fields = self.heaters + ["import", "export", "self_consumed"]
+        self.record_format = "<I" + "f" * len(self.fields)
+        self.record_size = struct.calcsize(self.record_format)
+        self.daily_path = f"{path}_daily.bin" if path else None
+        self.monthly_path = f"{path}_monthly.bin" if path else None
+        self.open_path = f"{path}_open.bin" if path else None
+        self.max_gap = max_gap
+        self.timestamp = None
+        self.powers = None
+        self.day_key = None
+        self.day_totals = self._zeros()
+        self.month_totals = self._zeros()
+        self.year_totals = self._zeros()
+
+    def _zeros(self):
+        return [0.0] * len(self.fields)
+
+    @staticmethod
+    def _day_key(timestamp):
+        local = time.localtime(timestamp)
+        return local.tm_year * 10000 + local.tm_mon * 100 + local.tm_mday
+
+    @staticmethod
+    def _next_midnight(timestamp):
+        local = time.localtime(timestamp)
+        return time.mktime((local.tm_year, local.tm_mon, local.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+    def load(self):
+        """Restores the open day, month and year totals from the files.
+
+        An open day of an earlier date is closed into the daily rollups and monthly rollups missing for
+        the months before the current one are rebuilt from the daily records, so no energy is lost when
+        the controller was stopped over midnight or the end of a month.
+        """
+        today = self._day_key(time.time())
+        open_day = self._read_open()
+        if open_day is not None:
+            key, totals = open_day
+            if key == today:
+                self.day_key = key
+                self.day_totals = totals
+            elif key > self._last_key(self.daily_path):
+                self._append(self.daily_path, key, totals)
+        self._rebuild_months(today // 100)
+        year = today // 10000
+        for key, totals in self._read(self.monthly_path):
+            if key // 100 == year:
+                self._add(self.year_totals, totals)
+        month = today // 100
+        for key, totals in self._read(self.daily_path, stop=lambda key: key // 100 != month):
+            self._add(self.month_totals, totals)
+            self._add(self.year_totals, totals)
+        self._add(self.month_totals, self.day_totals)
+        self._add(self.year_totals, self.day_totals)
+
+    def _rebuild_months(self, month):
+        """Appends rollups of months before month which have daily records but no monthly rollup"""
+        last_month = self._last_key(self.monthly_path)
+        months = {}
+        for key, totals in self._read(self.daily_path, stop=lambda key: key // 100 <= last_month):
+            if key // 100 < month:
+                self._add(months.setdefault(key // 100, self._zeros()), totals)
+        for key in sorted(months):
+            logging.info(f"[LEDGER] Month {key} rebuilt from daily rollups")
+            self._append(self.monthly_path, key, months[key])
+
+    def _last_key(self, path):
+        for key, _ in self._read(path):
+            return key
+        return 0
+
+    def _read_open(self):
+        if self.open_path is None:
+            return None
+        try:
+            with open(self.open_path, "rb") as file:
+                key, *totals = struct.unpack(self.record_format, file.read(self.record_size))
+        except (OSError, struct.error) as e:
+            logging.info(f"[LEDGER] {self.open_path} not read: {e}")
+            return None
+        return key, totals
+
+    def save(self):
+        """Atomic rewrite of the open day record"""
+        if self.open_path is None or self.day_key is None:
+            return
+        temporary_path = f"{self.open_path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(struct.pack(self.record_format, self.day_key, *self.day_totals))
+        os.replace(temporary_path, self.open_path)
+
+    def _read(self, path, stop=None):
+        """Records from the end of the file backwards, until stop(key) is true"""
+        if path is None:
+            return
+        try:
+            with open(path, "rb") as file:
+                file.seek(0, os.SEEK_END)
+                position = file.tell() - file.tell() % self.record_size
+                while position > 0:
+                    position -= self.record_size
+                    file.seek(position)
+                    key, *totals = struct.unpack(self.record_format, file.read(self.record_size))
+                    if stop and stop(key):
+                        break
+                    yield key, totals
+        except OSError as e:
+            logging.info(f"[LEDGER] {path} not read: {e}")
+
+    def _append(self, path, key, totals):
+        if path is None:
+            return
+        with open(path, "ab") as file:
+            file.write(struct.pack(self.record_format, key, *totals))
+
+    @staticmethod
+    def _add(totals, values):
+        for index, value in enumerate(values):
+            totals[index] += value
+
+    def record(self, timestamp, powers, forward, reverse):
+        """Integrates the previous powers up to timestamp and keeps the new ones.
+
+        powers  - [W] power of every heater
+        forward - [W] import from the grid, reverse - [W] export to the grid, without the heaters unless metered
+        """
+        if self.timestamp is not None and 0 < timestamp - self.timestamp <= self.max_gap:
+            start = self.timestamp
+            midnight = self._next_midnight(start)
+            if timestamp > midnight:
+                self._integrate(midnight - start)
+                self._close_day(midnight)
+                start = midnight
+            self._integrate(timestamp - start)
+        elif self.day_key is not None and self._day_key(timestamp) != self.day_key:
+            self._close_day(timestamp)
+        if self.day_key is None:
+            self.day_key = self._day_key(timestamp)
+        self.timestamp = timestamp
+        self.powers = [max(power, 0) for power in powers] + [max(forward, 0), max(reverse, 0)]
+
+    def _integrate(self, seconds):
+        heaters = self.powers[:len(self.heaters)]
+        forward, reverse = self.powers[len(self.heaters):]
+        heaters_total = sum(heaters)
+        if self.heaters_metered:
+            # import and export are measured, heaters use the surplus they are not importing
+            self_consumed = min(heaters_total, max(reverse - forward + heaters_total, 0))
+            values = heaters + [forward, reverse, self_consumed]
+        else:
+            # heaters are not seen by the meter, the surplus covers them first and the rest comes from the grid
+            self_consumed = min(heaters_total, max(reverse - forward, 0))
+            values = heaters + [forward + heaters_total - self_consumed, reverse - min(reverse, self_consumed),
+                                self_consumed]
+        kwh = seconds / 3600 / 1000
+        for index, value in enumerate(values):
+            energy = value * kwh
+            self.day_totals[index] += energy
+            self.month_totals[index] += energy
+            self.year_totals[index] += energy
+
+    def _close_day(self, timestamp):
+        """Appends the day rollup, and the month rollup on the change of month"""
+        new_key = self._day_key(timestamp)
+        self._append(self.daily_path, self.day_key, self.day_totals)
+        if new_key // 100 != self.day_key // 100:
+            self._append(self.monthly_path, self.day_key // 100, self.month_totals)
+            self.month_totals = self._zeros()
+        if new_key // 10000 != self.day_key // 10000:
+            self.year_totals = self._zeros()
+        self.day_totals = self._zeros()
+        self.day_key = new_key
+        self.save()
+
+    def _report(self, totals):
+        report = dict(zip(self.fields, totals))
+        used = report["self_consumed"] + report["export"]
+        report["self_consumption_ratio"] = report["self_consumed"] / used if used else 0.0
+        return report
+
+    def day(self):
+        return self._report(self.day_totals)
+
+    def month(self):
+        return self._report(self.month_totals)
+
+    def year_to_date(self):
+        return self._report(self.year_totals)
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from .heater_simulator import HeaterPolicy
+
+HEATER_NAMES = ("heater_2000W", "heater_1000W", "heater_500W")
+
+
+class MultiSiteController:
+    """Independent meter/heater sites controlled by one process.
+
+    State of the sites is kept as struct of arrays with one element per site, cloud callbacks only store
+    values at the index of their site and step() makes the decision of all sites in one vectorised pass
+    of HeaterPolicy (the same rules as EnergyManager in energy mode). A site takes part in a decision only
+    when new energy diffs arrived since its previous decision and its grid meter is alive. The callbacks run
+    on the thread of the cloud clients, the diffs and their flags are read and cleared under a lock.
+    """
+
+    def __init__(self, sites, actuators=None, watchdog_timeout=10, clock=time.monotonic, heaters_metered=False,
+                 **thresholds):
+        # sites           - names of sites
+        # actuators       - optional RelayActuator of every site, called only for sites with changed heaters
+        # heaters_metered - the meters see the heaters (real relays), their power is added back to the surplus
+        # thresholds      - HeaterPolicy thresholds, scalars or arrays with one value per site
+        self.sites = list(sites)
+        self.index = {site: index for index, site in enumerate(self.sites)}
+        size = len(self.sites)
+        self.actuators = actuators
+        self.watchdog_timeout = watchdog_timeout
+        self.clock = clock
+        self.heaters_metered = heaters_metered
+        self.energy_forward_diff = np.zeros(size)
+        self.energy_reverse_diff = np.zeros(size)
+        self.energy_read = np.zeros(size, dtype=bool)
+        self.lock = threading.Lock()
+        self.gridmeter_seen = np.full(size, -math.inf)
+        self.energy_balance = np.zeros(size, dtype=np.int64)
+        self.policy = HeaterPolicy(size, **thresholds)
+
+    def read_energy_forward_diff(self, site, value):
+        index = self.index[site]
+        with self.lock:
+            self.energy_forward_diff[index] = value
+            self.energy_read[index] = True
+        self.gridmeter_seen[index] = self.clock()
+
+    def read_energy_reverse_diff(self, site, value):
+        index = self.index[site]
+        with self.lock:
+            self.energy_reverse_diff[index] = value
+            self.energy_read[index] = True
+        self.gridmeter_seen[index] = self.clock()
+
+    def read_grid_meter_frame(self, site):
+        self.gridmeter_seen[self.index[site]] = self.clock()
+
+    def check_wdg_gridmeter_controller(self, site):
+        """Explicit heartbeat of the grid meter, any other message from it proves liveness as well"""
+        self.gridmeter_seen[self.index[site]] = self.clock()
+
+    @property
+    def gridmeter_alive(self):
+        return self.clock() - self.gridmeter_seen < self.watchdog_timeout
+
+    def step(self):
+        """One decision of all sites, returns indexes of sites with changed heaters"""
+        alive = self.gridmeter_alive
+        with self.lock:
+            valid = self.energy_read & alive
+            surplus = self.energy_reverse_diff - self.energy_forward_diff
+            self.energy_read &= ~valid
+        if self.heaters_metered:
+            surplus = surplus + self.policy.power_of_heaters()
+        previous = self.policy.state.copy()
+        self.policy.step(surplus, valid)
+        changed = np.flatnonzero(previous != self.policy.state)
+        if self.actuators is not None:
+            self.actuate(changed)
+        balance = surplus - self.policy.power_of_heaters()
+        np.copyto(self.energy_balance, balance.astype(np.int64), where=valid)
+        return changed
+
+    def actuate(self, changed):
+        """Commands the heaters of changed sites and repeats unacknowledged commands of the others"""
+        sites = set(changed.tolist())
+        sites.update(index for index, actuator in enumerate(self.actuators) if actuator.pending is not None)
+        for index in sites:
+            code = int(self.policy.state[index])
+            commanded = self.actuators[index].apply(
+                {name: bool(code >> bit & 1) for bit, name in enumerate(HEATER_NAMES)})
+            # heaters held by the minimum switching time keep their state
+            self.policy.state[index] = sum(1 << bit for bit, name in enumerate(HEATER_NAMES) if commanded[name])
+
+    def power_of_heaters(self, site):
+        return int(self.policy.power_table[self.policy.state[self.index[site]]])
+
+    def heaters(self, site):
+        code = int(self.policy.state[self.index[site]])
+        return {name: bool(code >> bit & 1) for bit, name in enumerate(HEATER_NAMES)}
@@ -0,0 +1,65 @@
+from itertools import product
+
+PHASES = ("L1", "L2", "L3")
+
+
+class PhaseBalancer:
+    """Heater selection from the instantaneous per-phase surplus.
+
+    Every heater is connected to one phase. The selected set of heaters uses as much of the surplus as possible
+    while the total heater power stays within the total surplus and the heaters on every phase draw
+    at most phase_import_limit from the grid on that phase.
+    """
+
+    def __init__(self, heater_powers, heater_phases, phase_import_limit=0, hysteresis=0.25):
+        # heater_powers      - {heater: power [W]}
+        # heater_phases      - {heater: phase}
+        # phase_import_limit - [W] allowed import per phase caused by heaters, 0 - export is balanced per phase
+        # hysteresis         - share of power a heater which is already on may draw from the grid before turning off
+        self.heater_powers = heater_powers
+        self.heater_phases = heater_phases
+        self.phase_import_limit = phase_import_limit
+        self.hysteresis = hysteresis
+
+    @staticmethod
+    def phase_surplus(frame, sign=1):
+        """Surplus per phase [W] from active power, sign=1 when the meter reports import as positive power"""
+        return {phase: -sign * frame.get(f"{phase}_active_power", 0.0) for phase in PHASES}
+
+    def without_heaters(self, phase_surplus, heaters):
+        """Surplus per phase with the power of heaters which are on added back, when the meter sees them"""
+        surplus = dict(phase_surplus)
+        for heater, state in heaters.items():
+            if state:
+                surplus[self.heater_phases[heater]] += self.heater_powers[heater]
+        return surplus
+
+    def required_power(self, heater, state):
+        power = self.heater_powers[heater]
+        return power * (1 - self.hysteresis) if state else power
+
+    def select(self, phase_surplus, heaters):
+        """Returns {heater: state} for the heater-independent surplus per phase and current heater states"""
+        names = list(self.heater_powers)
+        best = None
+        best_key = None
+        for combination in product((False, True), repeat=len(names)):
+            selected = dict(zip(names, combination))
+            if not self._fits(selected, phase_surplus, heaters):
+                continue
+            power = sum(self.heater_powers[name] for name in names if selected[name])
+            switches = sum(1 for name in names if selected[name] != heaters[name])
+            key = (power, -switches)
+            if best_key is None or key > best_key:
+                best, best_key = selected, key
+        return best
+
+    def _fits(self, selected, phase_surplus, heaters):
+        total = 0
+        for phase in PHASES:
+            required = sum(self.required_power(name, heaters[name]) for name in selected
+                           if selected[name] and self.heater_phases[name] == phase)
+            if required and required - phase_surplus[phase] > self.phase_import_limit:
+                return False
+            total += required
+        return total == 0 or total <= sum(phase_surplus.values())
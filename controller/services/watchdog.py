@@ -3,10 +3,23 @@ import logging
 import sys
 
 
+def cloud_is_connected(client):
+    """The cloud client sets its thing id after the MQTT connection and the thing discovery.
+
+    on_read callbacks run from the start of the client, before both, so the first callback proves nothing.
+    """
+    return getattr(client, "thing_id", None) is not None
+
+
 class Watchdog:
-    def __init__(self):
+    def __init__(self, heartbeat=None, clock=time.time, wait_for_cloud=False):
         # int - board the board on which the application is running
         # ext - a board that is ext and sends a watchdog signal periodically
+        # heartbeat - optional Heartbeat, the ext board is alive when any message was received from it recently
+        # wait_for_cloud - the ext board is not checked until cloud_connected(), it cannot be heard before
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.connected = not wait_for_cloud
         self.wdg_int_ext = False
         self.wdg_ext_int = False
         self.wdg_ext_int_timestamp = 0.0
@@ -21,11 +34,7 @@ class Watchdog:
         while True:
             time.sleep(interval)
 
-            if self._is_watchdog_alive():
-                self._reset_watchdog_state(devices)
-                logging.info(f"[WATCHDOG] GRIDMETER ALIVE: {devices.gridmeter_alive}")
-            else:
-                self._handle_watchdog_failure(devices, max_failures)
+            self.check(devices, max_failures)
 
             if self.wdg_ext_int_counter > 150:
                 self._reset_watchdog_counters()
@@ -35,8 +44,49 @@ class Watchdog:
                 self.wdg_ext_int_counter += 1
                 time.sleep(0.1)
 
+    def check(self, devices, max_failures=5):
+        """One check of the ext board, skipped until the cloud is connected"""
+        if not self.connected:
+            logging.info(f"[WATCHDOG] Waiting for cloud connection")
+            return
+        if self._is_watchdog_alive():
+            self._reset_watchdog_state(devices)
+            logging.info(f"[WATCHDOG] GRIDMETER ALIVE: {devices.gridmeter_alive}")
+        else:
+            self._handle_watchdog_failure(devices, max_failures)
+
+    def cloud_connected(self):
+        """Starts the checks, the ext board gets the whole timeout from now to be heard"""
+        if self.connected:
+            return
+        self.connected = True
+        if self.heartbeat is not None:
+            self.heartbeat.reset(self.clock())
+
+    def update_connection(self, client):
+        """Starts the checks once the cloud client is connected, True from then on"""
+        if not self.connected and cloud_is_connected(client):
+            self.cloud_connected()
+        return self.connected
+
+    def message_received(self):
+        """Any message from the ext board proves that it is alive"""
+        if self.heartbeat is not None:
+            self.heartbeat.received(self.clock())
+
+    def message_sent(self):
+        """Any message to the ext board proves to it that the int board is alive"""
+        if self.heartbeat is not None:
+            self.heartbeat.sent(self.clock())
+
+    def heartbeat_due(self):
+        """True when the int board must send the watchdog signal, every call without heartbeat"""
+        return self.heartbeat is None or self.heartbeat.due(self.clock())
+
     def _is_watchdog_alive(self):
         """Auxiliary method: check that watchdog is alive"""
+        if self.heartbeat is not None:
+            return self.heartbeat.alive(self.clock())
         return (self.wdg_ext_int_counter != self.wdg_ext_int_counter_old and
                 self.wdg_ext_int_timestamp != self.wdg_ext_int_timestamp_old)
 
@@ -0,0 +1,58 @@
+import binascii
+import struct
+
+FIELDS = ("L1_voltage", "L2_voltage", "L3_voltage",
+          "L1_current", "L2_current", "L3_current",
+          "L1_active_power", "L2_active_power", "L3_active_power")
+
+# version -> (struct format after the version byte, scale of every field), the same as grid_meter/services/wire.py
+WIRE_FORMATS = {
+    1: (struct.Struct("<HHI3H3h3h"), (100, 100, 100, 100, 100, 100, 1, 1, 1))
+}
+REORDER_WINDOW = 64
+
+
+def decode_frame(payload):
+    """Decodes a base64 binary grid meter frame, returns (boot id, sequence, timestamp, frame), ValueError when invalid
+    """
+    data = binascii.a2b_base64(payload)
+    if not data or data[0] not in WIRE_FORMATS:
+        raise ValueError(f"Unknown frame version {data[0] if data else None}")
+    layout, scales = WIRE_FORMATS[data[0]]
+    try:
+        boot_id, sequence, timestamp, *values = layout.unpack_from(data, 1)
+    except struct.error as e:
+        raise ValueError(f"Truncated frame: {e}")
+    return boot_id, sequence, timestamp, {field: value / scale for field, value, scale in zip(FIELDS, values, scales)}
+
+
+class SequenceTracker:
+    """Drops duplicated and reordered frames by their 16-bit sequence number, counts lost frames.
+
+    A new boot id is a restart of the grid meter, its sequence starts again from 1. Within one boot, a sequence
+    number up to REORDER_WINDOW behind the last one is an old frame, a bigger jump back is accepted as well.
+    """
+
+    def __init__(self):
+        self.boot_id = None
+        self.last = None
+        self.lost = 0
+        self.dropped = 0
+        self.restarts = 0
+
+    def accept(self, sequence, boot_id=None):
+        if boot_id != self.boot_id:
+            if self.boot_id is not None:
+                self.restarts += 1
+            self.boot_id = boot_id
+            self.last = None
+        if self.last is not None:
+            behind = (self.last - sequence) & 0xFFFF
+            if behind < REORDER_WINDOW:
+                self.dropped += 1
+                return False
+            ahead = (sequence - self.last) & 0xFFFF
+            if ahead < 0x8000:
+                self.lost += ahead - 1
+        self.last = sequence
+        return True
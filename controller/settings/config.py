@@ -16,6 +16,7 @@ class Validator:
         self.energy_balance = False,
         self.power_of_heaters = False,
         self.grid_meter_frame = False
+        self.phase_power = True
 
 
 class Constants:
@@ -23,3 +24,33 @@ class Constants:
         self.HEATER_2000W_POWER = 2000
         self.HEATER_1000W_POWER = 1000
         self.HEATER_500W_POWER = 500
+        self.ACTIVATION_THRESHOLD = 500
+        self.HEATER_2000W_OFF_HIGH = 0.75
+        self.HEATER_2000W_OFF_LOW = 0.25
+        self.HEATER_1000W_OFF = 0.5
+        self.CHECKPOINT_PATH = "checkpoint.json"
+        self.CHECKPOINT_MAX_AGE = 300
+        self.CHECKPOINT_INTERVAL = 60
+        self.FORECAST_ENABLED = True
+        self.FORECAST_HORIZON = 90  # energy diffs are 120 s averages (60 s old on arrival) + 30 s control interval
+        self.FORECAST_TIME_CONSTANT = 300
+        self.PHASE_FORECAST_HORIZON = 45  # frames every 30 s (15 s old on average) + 30 s control interval
+        self.LEDGER_PATH = "ledger"  # ledger_daily.bin and ledger_monthly.bin
+        self.LEDGER_MAX_GAP = 600
+        self.HEARTBEAT_TIMEOUT = 10  # grid meter is dead after 10 s without any message from it
+        self.HEARTBEAT_QUIET_FRACTION = 0.3
+        self.HTTP_API_ENABLED = True
+        self.HTTP_API_HOST = "0.0.0.0"  # read-only API for local dashboards
+        self.HTTP_API_PORT = 8080
+        self.ACTUATOR_BACKEND = "remote"  # "remote" - executor board through the cloud, "gpio", "simulated"
+        self.RELAY_PINS = {"heater_2000W": 17, "heater_1000W": 27, "heater_500W": 22}
+        self.RELAY_ACTIVE_LOW = False
+        self.RELAY_MIN_ON_TIME = 60
+        self.RELAY_MIN_OFF_TIME = 60
+        self.RELAY_ACK_TIMEOUT = 10
+        self.CONTROL_MODE = "energy"  # "energy" - 120 s energy diffs, "phase" - instantaneous per-phase power
+        self.HEATER_PHASES = {"heater_2000W": "L1", "heater_1000W": "L2", "heater_500W": "L3"}
+        self.PHASE_POWER_SIGN = 1  # 1 - meter reports import as positive active power
+        self.PHASE_IMPORT_LIMIT = 0
+        self.PHASE_HYSTERESIS = 0.25
+        self.PHASE_CROSS_CHECK_TOLERANCE = 500
@@ -0,0 +1,93 @@
+import pytest
+from controller.services.actuator import RelayActuator, RemoteRelays, SimulatedRelays
+
+NAMES = ("heater_2000W", "heater_1000W", "heater_500W")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_actuator(clock, respond=True, **kwargs):
+    relays = SimulatedRelays(respond=respond)
+    return RelayActuator(relays, NAMES, clock=clock, **kwargs), relays
+
+
+def test_first_command_sends_all_relays(clock):
+    actuator, relays = make_actuator(clock)
+
+    actuator.apply({"heater_2000W": True, "heater_1000W": False, "heater_500W": False})
+
+    assert relays.commands == [(1, {"heater_2000W": True, "heater_1000W": False, "heater_500W": False})]
+
+
+def test_only_changed_relays_in_one_command(clock):
+    actuator, relays = make_actuator(clock)
+    actuator.apply({"heater_2000W": True, "heater_1000W": False, "heater_500W": False})
+
+    actuator.apply({"heater_2000W": True, "heater_1000W": True, "heater_500W": True})
+    actuator.apply({"heater_2000W": True, "heater_1000W": True, "heater_500W": True})
+
+    assert relays.commands[1:] == [(2, {"heater_1000W": True, "heater_500W": True})]
+    assert actuator.metrics["commands"] == 2
+
+
+def test_minimum_on_time_holds_relay(clock):
+    actuator, relays = make_actuator(clock, min_on_time=60, min_off_time=30)
+    actuator.apply({"heater_2000W": True, "heater_1000W": False, "heater_500W": False})
+
+    clock.now += 30
+    commanded = actuator.apply({"heater_2000W": False, "heater_1000W": False, "heater_500W": False})
+
+    assert commanded["heater_2000W"] is True
+    assert actuator.metrics["held"] == 1
+    clock.now += 30
+    assert actuator.apply({"heater_2000W": False, "heater_1000W": False, "heater_500W": False})["heater_2000W"] is False
+
+
+def test_unacknowledged_command_is_repeated_and_executor_dead(clock):
+    actuator, relays = make_actuator(clock, respond=False, ack_timeout=10)
+    desired = {"heater_2000W": True, "heater_1000W": False, "heater_500W": False}
+    actuator.apply(desired)
+
+    clock.now += 5
+    actuator.apply(desired)
+    assert len(relays.commands) == 1
+    assert actuator.alive
+
+    clock.now += 5
+    actuator.apply(desired)
+    assert len(relays.commands) == 2
+    assert actuator.metrics["retries"] == 1
+    assert not actuator.alive
+
+    clock.now += 0.5
+    actuator.acknowledge(2)
+    assert actuator.alive
+    assert actuator.metrics["latency_last"] == pytest.approx(0.5)
+
+
+def test_late_acknowledgement_of_superseded_command_is_ignored(clock):
+    actuator, relays = make_actuator(clock, respond=False)
+    actuator.apply({"heater_2000W": True, "heater_1000W": False, "heater_500W": False})
+    actuator.apply({"heater_2000W": True, "heater_1000W": True, "heater_500W": False})
+
+    actuator.acknowledge(1)
+
+    assert actuator.actual == {name: None for name in NAMES}
+    actuator.acknowledge(2)
+    assert actuator.actual == {"heater_2000W": True, "heater_1000W": True, "heater_500W": False}
+
+
+def test_remote_command_encoding():
+    assert RemoteRelays.encode(7, {"heater_500W": True, "heater_1000W": False}) == \
+        "seq:7;heater_500W:1;heater_1000W:0;"
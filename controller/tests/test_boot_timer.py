@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+import pytest
+
+from controller.services.boot_timer import BootTimer
+
+
+def test_stages_in_order_of_first_occurrence():
+    with patch("time.monotonic", return_value=10.0):
+        timer = BootTimer()
+    for now, stage in ((10.2, "imports"), (10.5, "control_loop"), (11.0, "imports"), (12.25, "cloud_client")):
+        with patch("time.monotonic", return_value=now):
+            timer.mark(stage)
+
+    assert list(timer.stages) == ["imports", "control_loop", "cloud_client"]
+    assert timer.stages["imports"] == pytest.approx(0.2)
+    assert timer.stages["cloud_client"] == pytest.approx(2.25)
+
+
+def test_report_in_milliseconds():
+    with patch("time.monotonic", return_value=0.0):
+        timer = BootTimer()
+    with patch("time.monotonic", return_value=0.125):
+        timer.mark("imports")
+    with patch("time.monotonic", return_value=1.5):
+        timer.mark("first_frame")
+
+    assert timer.report() == "imports: 125 ms | first_frame: 1500 ms"
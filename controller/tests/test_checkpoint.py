@@ -0,0 +1,57 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+from controller.services.checkpoint import Checkpoint
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return Checkpoint(path=str(tmp_path / "checkpoint.json"), max_age=300)
+
+
+def test_save_and_load(checkpoint):
+    state = {"heaters": {"heater_2000W": True}, "energy_balance": 120}
+
+    checkpoint.save(state)
+
+    assert checkpoint.load() == state
+
+
+def test_save_leaves_no_temporary_file(checkpoint, tmp_path):
+    checkpoint.save({"energy_balance": 0})
+
+    assert [path.name for path in tmp_path.iterdir()] == ["checkpoint.json"]
+
+
+def test_load_missing_checkpoint(checkpoint):
+    assert checkpoint.load() is None
+
+
+def test_load_corrupted_checkpoint(checkpoint):
+    with open(checkpoint.path, "w") as file:
+        file.write("{\"timestamp\": 1")
+
+    assert checkpoint.load() is None
+
+
+def test_load_too_old_checkpoint(checkpoint):
+    with patch("time.time", return_value=1000.0):
+        checkpoint.save({"energy_balance": 0})
+
+    with patch("time.time", return_value=1301.0):
+        assert checkpoint.load() is None
+    with patch("time.time", return_value=1299.0):
+        assert checkpoint.load() == {"energy_balance": 0}
+
+
+def test_failed_save_keeps_previous_checkpoint(checkpoint):
+    checkpoint.save({"energy_balance": 1})
+
+    with patch("json.dump", side_effect=TypeError("not serializable")):
+        with pytest.raises(TypeError):
+            checkpoint.save({"energy_balance": object()})
+
+    with open(checkpoint.path) as file:
+        assert json.load(file)["state"] == {"energy_balance": 1}
+    assert not os.path.exists(f"{checkpoint.path}.tmp")
@@ -0,0 +1,87 @@
+import pytest
+from controller.services.cloud_loopback import LoopbackCloud
+
+
+@pytest.fixture
+def cloud():
+    return LoopbackCloud(latency=0.5)
+
+
+def test_on_read_value_is_delivered_to_linked_client(cloud):
+    received = []
+    sender = cloud.client("site")
+    receiver = cloud.client("site")
+    other_thing = cloud.client("other")
+    sender.register("energy_balance", value=0, on_read=lambda client: 100, interval=5)
+    receiver.register("energy_balance", value=0, on_write=lambda client, value: received.append((cloud.now, value)))
+    other_thing.register("energy_balance", value=0, on_write=lambda client, value: received.append("other"))
+    sender.start()
+
+    cloud.run(10)
+
+    assert received == [(0.5, 100), (5.5, 100)]  # republished every interval, also unchanged
+    assert receiver["energy_balance"] == 100
+
+
+def test_every_value_except_none_is_published(cloud):
+    values = iter([True, True, False, False, True, None])
+    sender = cloud.client("site")
+    sender.register("wdg", value=False, on_read=lambda client: next(values), interval=1)
+    sender.start()
+
+    cloud.run(5.5)
+
+    assert cloud.stats["published"] == 5
+    assert cloud.stats["callbacks"] == 6
+
+
+def test_dropped_messages():
+    cloud = LoopbackCloud(drop_rate=1.0)
+    sender = cloud.client("site")
+    receiver = cloud.client("site")
+    receiver.register("frame", on_write=lambda client, value: pytest.fail("message not dropped"))
+    sender.register("frame")
+
+    sender["frame"] = "L1_voltage:230.0;"
+    cloud.run(10)
+
+    assert cloud.stats["dropped"] == 1
+
+
+def test_reordered_messages():
+    cloud = LoopbackCloud(latency=0.1, reorder_rate=0.5, reorder_delay=10.0, seed=3)
+    received = []
+    sender = cloud.client("site")
+    receiver = cloud.client("site")
+    receiver.register("counter", on_write=lambda client, value: received.append(value))
+    sender.register("counter")
+
+    for i in range(50):
+        sender["counter"] = i
+        cloud.run(1)
+    cloud.run(20)
+
+    assert sorted(received) == list(range(50))
+    assert received != list(range(50))
+
+
+def test_trace_is_delivered_with_value(cloud):
+    sender = cloud.client("site")
+    receiver = cloud.client("site")
+    receiver.register("energy_reverse_diff", on_write=lambda client, value: None)
+    sender.register("energy_reverse_diff")
+
+    sender.trace = 42.0
+    sender["energy_reverse_diff"] = 1000
+    cloud.run(1)
+
+    assert receiver.delivered_traces["energy_reverse_diff"] == 42.0
+
+
+def test_every(cloud):
+    calls = []
+    cloud.every(30, lambda: calls.append(cloud.now))
+
+    cloud.run(100)
+
+    assert calls == [30, 60, 90]
@@ -0,0 +1,182 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from controller.services.actuator import RelayActuator, SimulatedRelays
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from controller.energy_manager import EnergyManager  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1718013600.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch, clock):
+    # ledger and checkpoint files are created in the working directory
+    monkeypatch.chdir(tmp_path)
+    return EnergyManager(clock=clock, monotonic=clock)
+
+
+def use_relays(manager, respond=True, **kwargs):
+    relays = SimulatedRelays(respond=respond)
+    manager.actuator = RelayActuator(relays, manager.heater_powers, clock=manager.clock, **kwargs)
+    return relays
+
+
+def test_step_repeats_unacknowledged_command_without_valid_balance(manager, clock):
+    relays = use_relays(manager, respond=False, ack_timeout=10)
+    manager.heaters.heater_2000W = True
+    manager.validator.energy_balance = False
+
+    manager.energy_management_step()
+    clock.now += 11
+    manager.energy_management_step()
+
+    assert [changes["heater_2000W"] for _, changes in relays.commands] == [True, True]
+    assert manager.actuator.metrics["retries"] == 1
+    assert manager.devices.executor_alive is False
+
+
+def test_dead_grid_meter_switches_heaters_off(manager):
+    relays = use_relays(manager)
+    manager.heaters.heater_1000W = True
+    manager.energy_management_step()
+    assert relays.states["heater_1000W"] is True
+
+    manager.devices.gridmeter_alive = False
+    manager.energy_management_step()
+
+    assert relays.states == {"heater_2000W": False, "heater_1000W": False, "heater_500W": False}
+    assert manager.power_of_heaters == 0
+
+
+def test_held_heater_corrects_balance(manager, clock):
+    use_relays(manager, min_on_time=60)
+    manager.heaters.heater_500W = True
+    manager.energy_management_step()
+    manager.constants.FORECAST_ENABLED = False
+    manager.energy_balance = -400
+    manager.validator.energy_balance = True
+
+    clock.now += 30
+    manager.energy_management_step()
+
+    assert manager.heaters.heater_500W is True
+    assert manager.energy_balance == -400
+
+
+def test_phase_power_cross_check_only_in_phase_mode(manager):
+    for mode, expected in (("energy", True), ("phase", False)):
+        manager.constants.CONTROL_MODE = mode
+        manager.validator.phase_power = True
+        manager.phase_surplus_sum, manager.phase_surplus_count = 3000.0, 1
+        manager.energy_forward_diff, manager.energy_reverse_diff = 0, 1000
+        manager.validator.energy_read = True
+
+        manager.update_energy_balance(None)
+
+        assert manager.validator.phase_power is expected
+
+
+def test_checkpoint_round_trip(manager):
+    manager.heaters.heater_1000W = True
+    manager.validator.energy_balance = True
+    manager.energy_balance = 640
+    manager.power_of_heaters = 1000
+    manager.grid_meter_frame["L1_voltage"] = 231.5
+    manager.save_checkpoint()
+
+    restored = EnergyManager()
+
+    assert restored.heaters.heater_1000W is True
+    assert restored.validator.energy_balance is True
+    assert restored.energy_balance == 640
+    assert restored.power_of_heaters == 1000
+    assert restored.grid_meter_frame["L1_voltage"] == 231.5
+
+
+def test_checkpoint_keeps_tuple_default_of_validator_flag(manager):
+    assert manager.validator.energy_read == (False,)
+    manager.validator.power_of_heaters = False
+    manager.save_checkpoint()
+
+    restored = EnergyManager()
+
+    assert restored.validator.energy_read == (False,)
+    assert restored.validator.power_of_heaters is False
+
+
+def test_checkpoint_with_non_bool_flag_starts_cold(manager):
+    manager.heaters.heater_1000W = True
+    manager.energy_balance = 640
+    state = manager.checkpoint_state()
+    state["validator"]["energy_read"] = [False]
+    manager.checkpoint.save(state)
+
+    restored = EnergyManager()
+
+    assert restored.heaters.heater_1000W is False
+    assert restored.energy_balance == 0
+
+
+def test_stale_checkpoint_is_ignored(manager):
+    manager.heaters.heater_1000W = True
+    manager.energy_balance = 640
+    with patch("time.time", return_value=1000.0):
+        manager.save_checkpoint()
+
+    with patch("time.time", return_value=1000.0 + manager.constants.CHECKPOINT_MAX_AGE + 1):
+        restored = EnergyManager()
+
+    assert restored.heaters.heater_1000W is False
+    assert restored.energy_balance == 0
+
+
+@pytest.mark.parametrize("backend, reverse, balance", [("simulated", 1500, 500), ("gpio", 500, 500)])
+def test_heater_power_is_subtracted_only_when_not_metered(manager, backend, reverse, balance):
+    manager.constants.ACTUATOR_BACKEND = backend
+    manager.power_of_heaters = 1000
+    manager.energy_forward_diff, manager.energy_reverse_diff = 0, reverse
+    manager.validator.energy_read = True
+
+    assert manager.update_energy_balance(None) == balance
+    assert manager.forecaster.surplus.values[0][0] == 1500
+
+
+def test_phase_mode_acts_on_forecast_phase_surplus(manager, clock):
+    for surplus in (1400.0, 1600.0, 1800.0, 1900.0):
+        manager.grid_meter_frame.update(L1_active_power=-surplus, L2_active_power=0.0, L3_active_power=0.0)
+        manager.update_phase_surplus()
+        clock.now += 30
+
+    manager.adjust_heaters_per_phase()
+
+    assert manager.phase_surplus["L1"] == 1900.0
+    assert manager.heaters.heater_2000W is True
+
+    manager.constants.FORECAST_ENABLED = False
+    manager.heaters.heater_2000W = False
+    manager.adjust_heaters_per_phase()
+
+    assert manager.heaters.heater_2000W is False
+
+
+def test_events_delivered_as_float(manager, caplog):
+    manager.read_grid_meter_events(None, 5.0)
+
+    assert manager.grid_meter_events == 5
+    assert isinstance(manager.grid_meter_events, int)
+    assert "Events: 0x05" in caplog.text
@@ -0,0 +1,97 @@
+import time
+import pytest
+from controller.services.forecaster import TrendForecaster, SurplusForecaster
+
+
+def test_not_enough_history():
+    forecaster = TrendForecaster()
+    assert forecaster.predict(0.0) is None
+
+    forecaster.add(0.0, 100.0)
+
+    assert forecaster.predict(30.0) is None
+
+
+def test_linear_trend_is_extrapolated():
+    forecaster = SurplusForecaster()
+    for i in range(20):
+        forecaster.add_surplus(i * 30.0, 1000.0 + 10.0 * i)
+
+    assert forecaster.predict_surplus(19 * 30.0 + 60.0) == pytest.approx(1000.0 + 10.0 * 21)
+
+
+def test_constant_series_of_several_columns():
+    forecaster = TrendForecaster(columns=3)
+    for i in range(5):
+        forecaster.add(i * 30.0, (-500.0, 200.0, 0.0))
+
+    assert forecaster.predict(200.0) == pytest.approx([-500.0, 200.0, 0.0])
+
+
+def test_per_phase_trend_is_extrapolated():
+    forecaster = SurplusForecaster()
+    for i in range(5):
+        forecaster.add_phases(i * 30.0, 1000.0 + 100.0 * i, -200.0, 0.0)
+
+    assert forecaster.predict_phases(4 * 30.0 + 45.0) == pytest.approx([1550.0, -200.0, 0.0])
+
+
+def test_buffers_are_allocated_with_first_sample():
+    forecaster = TrendForecaster(columns=3, capacity=720)
+    assert forecaster.values is None
+    assert forecaster.predict(0.0) is None
+
+    forecaster.add(0.0, (1.0, 2.0, 3.0))
+
+    assert forecaster.values.shape == (720, 3)
+
+
+def test_samples_at_same_time_return_weighted_mean():
+    forecaster = TrendForecaster()
+    forecaster.add(10.0, 100.0)
+    forecaster.add(10.0, 300.0)
+
+    assert forecaster.predict(10.0)[0] == pytest.approx(200.0)
+
+
+def test_burst_of_samples_does_not_extrapolate():
+    forecaster = TrendForecaster()
+    forecaster.add(100.0, 1500.0)
+    forecaster.add(100.001, 1800.0)
+
+    assert forecaster.predict(190.0)[0] == pytest.approx(1650.0, abs=1.0)
+
+
+def test_stale_history():
+    forecaster = TrendForecaster(max_age=600.0)
+    forecaster.add(0.0, 1.0)
+    forecaster.add(30.0, 2.0)
+
+    assert forecaster.predict(631.0) is None
+
+
+def test_recent_samples_dominate_after_ring_wraps():
+    forecaster = TrendForecaster(capacity=10, time_constant=60.0)
+    for i in range(15):
+        forecaster.add(i * 30.0, 0.0 if i < 10 else 2000.0)
+
+    assert forecaster.size == 10
+    assert forecaster.predict(14 * 30.0)[0] > 1500.0
+
+
+def test_forecast_update_over_a_day_under_1ms():
+    forecaster = SurplusForecaster()
+    for i in range(2880):
+        forecaster.add_surplus(i * 30.0, float(i % 100))
+        forecaster.add_phases(i * 30.0, 1.0, 2.0, 3.0)
+
+    timings = []
+    for i in range(50):
+        start = time.perf_counter()
+        forecaster.add_surplus(2880 * 30.0 + i, 50.0)
+        forecaster.predict_surplus(2880 * 30.0 + i + 90.0)
+        forecaster.add_phases(2880 * 30.0 + i, 1.0, 2.0, 3.0)
+        forecaster.predict_phases(2880 * 30.0 + i + 45.0)
+        timings.append(time.perf_counter() - start)
+
+    assert min(timings) < 1e-3
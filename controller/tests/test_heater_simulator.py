@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from controller.services.heater_simulator import HeaterPolicy, parameter_grid, simulate, synthetic_trace
+from controller.settings import config
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from controller.energy_manager import EnergyManager  # noqa: E402
+
+
+def scalar_manager(constants):
+    energy_manager = EnergyManager.__new__(EnergyManager)
+    energy_manager.heaters = config.Heaters()
+    energy_manager.validator = config.Validator()
+    energy_manager.validator.energy_balance = True
+    energy_manager.constants = constants
+    return energy_manager
+
+
+def test_policy_matches_energy_manager():
+    rng = np.random.default_rng(1)
+    surplus = rng.uniform(-2000, 5000, 2000)
+    constants = config.Constants()
+    energy_manager = scalar_manager(constants)
+    policy = HeaterPolicy(1)
+
+    for value in surplus:
+        power_of_heaters = sum(power for power, state in zip((2000, 1000, 500), (
+            energy_manager.heaters.heater_2000W, energy_manager.heaters.heater_1000W,
+            energy_manager.heaters.heater_500W)) if state)
+        balance, power = energy_manager.activate_heaters(value - power_of_heaters, power_of_heaters)
+        expected_balance = energy_manager.deactivate_heaters(balance)
+
+        assert policy.step(np.array([value]))[0] == pytest.approx(expected_balance)
+        assert [bool(heater[0]) for heater in policy.heaters] == [energy_manager.heaters.heater_2000W,
+                                                                  energy_manager.heaters.heater_1000W,
+                                                                  energy_manager.heaters.heater_500W]
+
+
+def test_parameter_grid():
+    grid = parameter_grid(activation_threshold=[300, 500], heater_1000w_off=[0.4, 0.5, 0.6])
+
+    assert len(grid["activation_threshold"]) == 6
+    assert list(grid["heater_1000w_off"][:3]) == [0.4, 0.5, 0.6]
+
+
+def test_simulate_reports_per_combination():
+    surplus = np.array([3600.0, 3600.0, -400.0, -400.0])
+
+    result = simulate(surplus, step=3600, activation_threshold=[500, 5000])
+
+    assert result["switches"].tolist() == [6, 0]
+    assert result["self_consumption"].tolist() == pytest.approx([3.5, 0.0])
+    assert result["export"].tolist() == pytest.approx([3.7, 7.2])
+    assert result["grid_import"].tolist() == pytest.approx([4.3, 0.8])
+
+
+def test_month_of_steps_over_parameter_grid_in_seconds():
+    surplus = synthetic_trace(days=30)
+    grid = parameter_grid(activation_threshold=np.linspace(300, 1200, 10),
+                          heater_2000w_off_high=np.linspace(0.5, 1.0, 5),
+                          heater_2000w_off_low=np.linspace(0.1, 0.4, 4),
+                          heater_1000w_off=np.linspace(0.3, 0.8, 5))
+
+    start = time.perf_counter()
+    result = simulate(surplus, **grid)
+
+    assert len(result["switches"]) == 1000
+    assert time.perf_counter() - start < 20
@@ -0,0 +1,99 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from controller.services.http_api import SnapshotCache, create_server
+
+
+@pytest.fixture
+def cache():
+    cache = SnapshotCache()
+    cache.update("balance", {"energy_balance": 120})
+    return cache
+
+
+@pytest.fixture
+def url(cache):
+    server = create_server(cache, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers.get("ETag"), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), None
+
+
+def test_unchanged_value_is_not_serialised_again(cache):
+    version, body = cache.get("balance")
+
+    assert not cache.update("balance", {"energy_balance": 120})
+    assert cache.get("balance") == (version, body)
+    assert cache.update("balance", {"energy_balance": 80})
+    assert cache.get("balance")[0] == version + 1
+
+
+def test_cached_value_is_a_copy(cache):
+    frame = {"L1_voltage": 230.0}
+    cache.update("frame", frame)
+
+    frame["L1_voltage"] = 231.0
+
+    assert cache.update("frame", frame)
+
+
+def test_get_state_and_document(url):
+    status, etag, state = get(f"{url}/state")
+    assert status == 200
+    assert state == {"balance": {"energy_balance": 120}, "version": 1}
+
+    assert get(f"{url}/balance")[2] == {"energy_balance": 120}
+    assert get(f"{url}/unknown")[0] == 404
+
+
+def test_if_none_match(url, cache):
+    _, etag, _ = get(f"{url}/balance")
+
+    assert get(f"{url}/balance", etag)[0] == 304
+    cache.update("balance", {"energy_balance": 90})
+    assert get(f"{url}/balance", etag)[0] == 200
+
+
+def test_long_poll_returns_on_change(url, cache):
+    _, etag, _ = get(f"{url}/balance")
+    timer = threading.Timer(0.2, cache.update, ("balance", {"energy_balance": -300}))
+    timer.start()
+
+    status, new_etag, body = get(f"{url}/balance?wait=5", etag)
+
+    assert status == 200
+    assert new_etag != etag
+    assert body == {"energy_balance": -300}
+
+
+def test_long_poll_ignores_other_documents(url, cache):
+    _, etag, _ = get(f"{url}/balance")
+    cache.update("heaters", {"heater_500W": True})
+
+    assert get(f"{url}/balance?wait=0.3", etag)[0] == 304
+
+
+def test_event_stream(url, cache):
+    with urllib.request.urlopen(f"{url}/events", timeout=5) as response:
+        assert response.headers.get("Content-Type") == "text/event-stream"
+        assert response.readline() == b"id: 1\n"
+        assert json.loads(response.readline()[len("data: "):])["balance"] == {"energy_balance": 120}
+        response.readline()
+
+        cache.update("balance", {"energy_balance": 0})
+        assert response.readline() == b"id: 2\n"
@@ -0,0 +1,149 @@
+import time
+import pytest
+from unittest.mock import patch
+from controller.services.ledger import EnergyLedger
+
+HEATERS = ("heater_2000W", "heater_1000W", "heater_500W")
+
+
+def local(year, month, day, hour=0, minute=0):
+    return time.mktime((year, month, day, hour, minute, 0, 0, 0, -1))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return EnergyLedger(HEATERS, path=str(tmp_path / "ledger"), max_gap=3600)
+
+
+def test_record_integrates_previous_powers(ledger):
+    start = local(2024, 6, 10, 12)
+
+    ledger.record(start, [2000, 0, 500], forward=0, reverse=3000)
+    ledger.record(start + 1800, [0, 0, 0], forward=0, reverse=0)
+
+    day = ledger.day()
+    assert day["heater_2000W"] == pytest.approx(1.0)
+    assert day["heater_500W"] == pytest.approx(0.25)
+    assert day["self_consumed"] == pytest.approx(1.25)
+    assert day["export"] == pytest.approx(0.25)
+    assert day["import"] == pytest.approx(0.0)
+    assert day["self_consumption_ratio"] == pytest.approx(1.25 / 1.5)
+
+
+def test_heaters_above_surplus_are_imported(ledger):
+    start = local(2024, 6, 10, 12)
+
+    ledger.record(start, [2000, 0, 0], forward=0, reverse=500)
+    ledger.record(start + 3600, [0, 0, 0], forward=0, reverse=0)
+
+    day = ledger.day()
+    assert day["self_consumed"] == pytest.approx(0.5)
+    assert day["import"] == pytest.approx(1.5)
+    assert day["export"] == pytest.approx(0.0)
+
+
+def test_gap_is_not_integrated(ledger):
+    start = local(2024, 6, 10, 12)
+
+    ledger.record(start, [2000, 0, 0], forward=0, reverse=0)
+    ledger.record(start + 3601, [2000, 0, 0], forward=0, reverse=0)
+
+    assert ledger.day()["heater_2000W"] == 0.0
+
+
+def test_interval_is_split_at_midnight(ledger):
+    midnight = local(2024, 6, 11)
+
+    ledger.record(midnight - 120, [1000, 1000, 0], forward=0, reverse=0)
+    ledger.record(midnight + 240, [0, 0, 0], forward=0, reverse=0)
+
+    assert ledger.day()["heater_1000W"] == pytest.approx(1000 * 240 / 3600 / 1000)
+    assert ledger.month()["heater_1000W"] == pytest.approx(1000 * 360 / 3600 / 1000)
+    rollups = list(ledger._read(ledger.daily_path))
+    assert [key for key, _ in rollups] == [20240610]
+    assert rollups[0][1][0] == pytest.approx(1000 * 120 / 3600 / 1000)
+
+
+def test_month_rollup_and_year_to_date(ledger):
+    ledger.record(local(2024, 5, 31, 23, 55), [500, 0, 0], forward=0, reverse=0)
+    ledger.record(local(2024, 6, 1, 0, 5), [0, 0, 0], forward=0, reverse=0)
+
+    assert [key for key, _ in ledger._read(ledger.monthly_path)] == [202405]
+    assert ledger.year_to_date()["heater_2000W"] == pytest.approx(500 * 600 / 3600 / 1000)
+
+
+def test_load_restores_month_and_year_without_daily_history(ledger, tmp_path):
+    for day in (1, 2, 3):
+        ledger.record(local(2024, 5, day, 12), [2000, 0, 0], forward=0, reverse=0)
+        ledger.record(local(2024, 5, day, 12, 6), [0, 0, 0], forward=0, reverse=0)
+    ledger.record(local(2024, 6, 1, 12), [0, 1000, 0], forward=0, reverse=0)
+    ledger.record(local(2024, 6, 1, 12, 6), [0, 0, 0], forward=0, reverse=0)
+    ledger.record(local(2024, 6, 2, 12), [0, 0, 0], forward=0, reverse=0)
+
+    restored = EnergyLedger(HEATERS, path=str(tmp_path / "ledger"))
+    with patch("time.time", return_value=local(2024, 6, 2, 13)):
+        restored.load()
+
+    assert restored.month()["heater_1000W"] == pytest.approx(0.1)
+    assert restored.year_to_date()["heater_2000W"] == pytest.approx(0.6)
+    assert restored.year_to_date()["heater_1000W"] == pytest.approx(0.1)
+
+
+def test_open_day_is_restored_from_file(ledger, tmp_path):
+    now = time.time()
+    ledger.record(now - 60, [2000, 0, 0], forward=0, reverse=0)
+    ledger.record(now, [0, 0, 0], forward=0, reverse=0)
+    ledger.save()
+
+    restored = EnergyLedger(HEATERS, path=str(tmp_path / "ledger"))
+    restored.load()
+
+    assert restored.day() == pytest.approx(ledger.day())
+    assert restored.year_to_date()["heater_2000W"] == pytest.approx(ledger.day()["heater_2000W"])
+
+
+def test_restart_in_new_month_closes_open_day_and_rebuilds_month(ledger, tmp_path):
+    for day in (1, 2, 3):
+        ledger.record(local(2024, 5, day, 12), [2000, 0, 0], forward=0, reverse=0)
+        ledger.record(local(2024, 5, day, 12, 6), [0, 0, 0], forward=0, reverse=0)
+    ledger.save()
+
+    restored = EnergyLedger(HEATERS, path=str(tmp_path / "ledger"))
+    with patch("time.time", return_value=local(2024, 6, 2, 13)):
+        restored.load()
+
+    assert restored.year_to_date()["heater_2000W"] == pytest.approx(0.6)
+    assert restored.month()["heater_2000W"] == 0.0
+    assert [key for key, _ in restored._read(restored.daily_path)] == [20240503, 20240502, 20240501]
+    assert [key for key, _ in restored._read(restored.monthly_path)] == [202405]
+
+    again = EnergyLedger(HEATERS, path=str(tmp_path / "ledger"))
+    with patch("time.time", return_value=local(2024, 6, 2, 14)):
+        again.load()
+    assert again.year_to_date()["heater_2000W"] == pytest.approx(0.6)
+
+
+def test_metered_heaters_are_not_counted_twice():
+    ledger = EnergyLedger(HEATERS, path=None, max_gap=3600, heaters_metered=True)
+    start = local(2024, 6, 10, 12)
+
+    # 2500 W surplus without heaters, 2000 W heater on: the meter sees 500 W export
+    ledger.record(start, [2000, 0, 0], forward=0, reverse=500)
+    ledger.record(start + 3600, [0, 0, 0], forward=0, reverse=0)
+
+    day = ledger.day()
+    assert day["self_consumed"] == pytest.approx(2.0)
+    assert day["export"] == pytest.approx(0.5)
+    assert day["import"] == pytest.approx(0.0)
+
+
+def test_metered_heaters_above_surplus_are_imported():
+    ledger = EnergyLedger(HEATERS, path=None, max_gap=3600, heaters_metered=True)
+    start = local(2024, 6, 10, 12)
+
+    ledger.record(start, [2000, 0, 0], forward=1500, reverse=0)
+    ledger.record(start + 3600, [0, 0, 0], forward=0, reverse=0)
+
+    day = ledger.day()
+    assert day["self_consumed"] == pytest.approx(0.5)
+    assert day["import"] == pytest.approx(1.5)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from controller.load_harness import run_load_test  # noqa: E402
+
+
+def test_load_test_smoke_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    result = run_load_test(pairs=2, duration=600, jitter=0.1)
+
+    assert result["pairs"] == 2
+    assert result["simulated_s"] == 600
+    # every pair decides once per 120 s energy diff of the simulated time
+    assert result["decisions"] == pytest.approx(2 * 600 / 120, abs=2)
+    assert result["messages"] > 0
+    assert 0 < result["latency_p50_s"] <= result["latency_max_s"]
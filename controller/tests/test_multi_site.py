@@ -0,0 +1,143 @@
+import time
+
+import numpy as np
+import pytest
+
+from controller.services.actuator import RelayActuator, SimulatedRelays
+from controller.services.heater_simulator import HeaterPolicy
+from controller.services.multi_site import HEATER_NAMES, MultiSiteController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def feed(controller, site, forward, reverse):
+    controller.check_wdg_gridmeter_controller(site)
+    controller.read_energy_forward_diff(site, forward)
+    controller.read_energy_reverse_diff(site, reverse)
+
+
+def test_sites_are_independent(clock):
+    controller = MultiSiteController(["a", "b", "c"], clock=clock)
+    feed(controller, "a", 0, 3600)
+    feed(controller, "b", 800, 0)
+
+    changed = controller.step()
+
+    assert changed.tolist() == [0]
+    assert controller.heaters("a") == {"heater_2000W": True, "heater_1000W": True, "heater_500W": True}
+    assert controller.power_of_heaters("b") == 0
+    assert controller.energy_balance.tolist() == [100, -800, 0]
+
+
+def test_site_without_new_diffs_or_dead_meter_is_not_decided(clock):
+    controller = MultiSiteController(["a", "b"], watchdog_timeout=10, clock=clock)
+    feed(controller, "a", 0, 2600)
+    controller.step()
+
+    assert controller.step().tolist() == []
+
+    controller.read_energy_forward_diff("a", 3000)
+    clock.now += 11
+    assert controller.step().tolist() == []
+    assert controller.heaters("a")["heater_2000W"]
+
+
+def test_any_message_proves_liveness(clock):
+    controller = MultiSiteController(["a", "b"], watchdog_timeout=10, clock=clock)
+
+    controller.read_energy_reverse_diff("b", 2600)
+    assert controller.step().tolist() == [1]
+
+    clock.now += 8
+    controller.read_grid_meter_frame("a")
+    clock.now += 5
+    assert controller.gridmeter_alive.tolist() == [True, False]
+
+
+def test_matches_single_site_policy(clock):
+    rng = np.random.default_rng(1)
+    surplus = rng.uniform(-2000, 5000, (50, 4))
+    controller = MultiSiteController(["a", "b", "c", "d"], clock=clock)
+    policies = [HeaterPolicy(1) for _ in range(4)]
+
+    for values in surplus:
+        for index, site in enumerate(controller.sites):
+            feed(controller, site, max(-values[index], 0), max(values[index], 0))
+            policies[index].step(values[index])
+        controller.step()
+
+        assert controller.policy.state.tolist() == [int(policy.state[0]) for policy in policies]
+
+
+def test_actuator_holds_heaters_of_site(clock):
+    actuators = [RelayActuator(SimulatedRelays(), HEATER_NAMES, min_on_time=60, clock=clock) for _ in range(2)]
+    controller = MultiSiteController(["a", "b"], actuators, clock=clock)
+    feed(controller, "a", 0, 2600)
+    controller.step()
+
+    clock.now += 30
+    feed(controller, "a", 1000, 0)
+    controller.step()
+
+    assert controller.heaters("a")["heater_2000W"]
+    assert controller.energy_balance[0] == -3500
+    assert actuators[1].metrics["commands"] == 0
+
+
+def test_hundreds_of_sites_per_tick():
+    sites = [f"site{index}" for index in range(500)]
+    controller = MultiSiteController(sites)
+    rng = np.random.default_rng(0)
+    controller.gridmeter_seen[:] = time.time()
+
+    start = time.perf_counter()
+    for _ in range(100):
+        surplus = rng.uniform(-2000, 5000, len(sites))
+        controller.energy_reverse_diff[:] = np.maximum(surplus, 0)
+        controller.energy_forward_diff[:] = np.maximum(-surplus, 0)
+        controller.energy_read[:] = True
+        controller.step()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed / 100 < 0.005
+
+
+def test_diff_arriving_during_decision_is_kept(clock):
+    controller = MultiSiteController(["a"], clock=clock)
+    feed(controller, "a", 0, 600)
+    policy_step = controller.policy.step
+
+    def step_with_callback(surplus, valid):
+        controller.read_energy_reverse_diff("a", 2600)
+        return policy_step(surplus, valid)
+
+    controller.policy.step = step_with_callback
+    controller.step()
+
+    assert controller.energy_read.tolist() == [True]
+
+
+def test_metered_heaters_are_added_back_to_surplus(clock):
+    controller = MultiSiteController(["a", "b"], clock=clock, heaters_metered=True)
+    feed(controller, "a", 0, 3600)
+    feed(controller, "b", 0, 3600)
+    controller.step()
+
+    # the 3500 W of heaters are seen by the meters, the surplus is unchanged
+    feed(controller, "a", 0, 100)
+    feed(controller, "b", 0, 0)
+    controller.step()
+
+    assert controller.power_of_heaters("a") == 3500
+    assert controller.energy_balance.tolist() == [100, 0]
@@ -0,0 +1,66 @@
+import pytest
+from controller.services.phase_balancer import PhaseBalancer
+
+
+@pytest.fixture
+def balancer():
+    return PhaseBalancer(heater_powers={"heater_2000W": 2000, "heater_1000W": 1000, "heater_500W": 500},
+                         heater_phases={"heater_2000W": "L1", "heater_1000W": "L2", "heater_500W": "L3"})
+
+
+@pytest.fixture
+def heaters_off():
+    return {"heater_2000W": False, "heater_1000W": False, "heater_500W": False}
+
+
+def test_phase_surplus_from_frame():
+    frame = {"L1_active_power": -1200.0, "L2_active_power": 300.0, "L3_active_power": 0.0}
+
+    assert PhaseBalancer.phase_surplus(frame) == {"L1": 1200.0, "L2": -300.0, "L3": 0.0}
+    assert PhaseBalancer.phase_surplus(frame, sign=-1) == {"L1": -1200.0, "L2": 300.0, "L3": 0.0}
+
+
+def test_heaters_follow_export_of_own_phase(balancer, heaters_off):
+    selected = balancer.select({"L1": 2100.0, "L2": 400.0, "L3": 600.0}, heaters_off)
+
+    assert selected == {"heater_2000W": True, "heater_1000W": False, "heater_500W": True}
+
+
+def test_no_phase_is_overloaded_even_with_total_surplus(balancer, heaters_off):
+    selected = balancer.select({"L1": 1500.0, "L2": 1500.0, "L3": 0.0}, heaters_off)
+
+    assert selected == {"heater_2000W": False, "heater_1000W": True, "heater_500W": False}
+
+
+def test_import_limit_allows_net_metering_across_phases(heaters_off):
+    balancer = PhaseBalancer(heater_powers={"heater_2000W": 2000, "heater_1000W": 1000},
+                             heater_phases={"heater_2000W": "L1", "heater_1000W": "L2"},
+                             phase_import_limit=1000)
+
+    selected = balancer.select({"L1": 1500.0, "L2": 0.0, "L3": 1500.0}, heaters_off)
+
+    assert selected == {"heater_2000W": True, "heater_1000W": True}
+
+
+def test_hysteresis_keeps_running_heater_on(balancer):
+    heaters = {"heater_2000W": True, "heater_1000W": False, "heater_500W": False}
+
+    assert balancer.select({"L1": 1600.0, "L2": 0.0, "L3": 0.0}, heaters)["heater_2000W"] is True
+    assert balancer.select({"L1": 1400.0, "L2": 0.0, "L3": 0.0}, heaters)["heater_2000W"] is False
+
+
+def test_no_surplus_turns_everything_off(balancer):
+    heaters = {"heater_2000W": True, "heater_1000W": True, "heater_500W": True}
+
+    selected = balancer.select({"L1": -100.0, "L2": -100.0, "L3": -100.0}, heaters)
+
+    assert not any(selected.values())
+
+
+def test_metered_heaters_are_added_back_on_their_phase(balancer, heaters_off):
+    heaters = dict(heaters_off, heater_2000W=True)
+
+    surplus = balancer.without_heaters({"L1": 200.0, "L2": -100.0, "L3": 0.0}, heaters)
+
+    assert surplus == {"L1": 2200.0, "L2": -100.0, "L3": 0.0}
+    assert balancer.select(surplus, heaters)["heater_2000W"] is True
@@ -1,6 +1,7 @@
 import pytest
 import time
 from unittest.mock import MagicMock, patch
+from controller.services.heartbeat import Heartbeat
 from controller.services.watchdog import Watchdog, Devices
 
 
@@ -114,3 +115,60 @@ def test_run_watchdog():
 
     # stop of patch on the watchdog methods
     patch.stopall()
+
+
+def test_is_watchdog_alive_from_any_message():
+    clock = MagicMock(return_value=100.0)
+    watchdog = Watchdog(Heartbeat(timeout=60, now=100.0), clock=clock)
+
+    clock.return_value = 150.0
+    watchdog.message_received()
+    clock.return_value = 200.0
+    assert watchdog._is_watchdog_alive()
+
+    clock.return_value = 210.0
+    assert not watchdog._is_watchdog_alive()
+
+
+def test_heartbeat_due_without_heartbeat(watchdog):
+    assert watchdog.heartbeat_due()
+    assert watchdog.heartbeat_due()
+
+
+def test_check_waits_for_cloud_connection():
+    clock = MagicMock(return_value=100.0)
+    watchdog = Watchdog(Heartbeat(timeout=10, now=100.0), clock=clock, wait_for_cloud=True)
+    devices = Devices()
+
+    client = MagicMock(thing_id=None)  # on_read callbacks run before the connection and the thing discovery
+
+    clock.return_value = 200.0
+    assert watchdog.update_connection(client) is False
+    watchdog.check(devices)
+    assert devices.gridmeter_alive is True
+    assert watchdog.wdg_ext_int_failed_counter == 0
+
+    client.thing_id = "thing"
+    assert watchdog.update_connection(client) is True
+    clock.return_value = 205.0
+    assert watchdog.update_connection(client) is True  # the timeout is not restarted by later callbacks
+    clock.return_value = 209.0
+    watchdog.check(devices)
+    assert devices.gridmeter_alive is True
+
+    clock.return_value = 211.0
+    watchdog.check(devices)
+    assert devices.gridmeter_alive is False
+
+
+def test_sent_message_postpones_heartbeat():
+    clock = MagicMock(return_value=100.0)
+    watchdog = Watchdog(Heartbeat(timeout=10, quiet_fraction=0.3, now=100.0), clock=clock)
+    assert watchdog.heartbeat_due() is True
+
+    clock.return_value = 102.0
+    watchdog.message_sent()
+    clock.return_value = 104.0
+    assert watchdog.heartbeat_due() is False
+    clock.return_value = 105.0
+    assert watchdog.heartbeat_due() is True
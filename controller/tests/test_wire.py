@@ -0,0 +1,80 @@
+import base64
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+from controller.services.wire import SequenceTracker, decode_frame
+from grid_meter.services.wire import FrameEncoder
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from controller.energy_manager import EnergyManager  # noqa: E402
+
+FRAME = {
+    "L1_voltage": 230.12, "L2_voltage": 229.87, "L3_voltage": 231.5,
+    "L1_current": 4.35, "L2_current": 0.0, "L3_current": 12.07,
+    "L1_active_power": 980.0, "L2_active_power": -1500.0, "L3_active_power": 0.0001
+}
+
+
+def test_decode_round_trip():
+    payload = FrameEncoder(boot_id=513).encode(FRAME, 1700000000)
+
+    boot_id, sequence, timestamp, frame = decode_frame(payload)
+
+    assert (boot_id, sequence, timestamp) == (513, 1, 1700000000)
+    assert frame == pytest.approx(FRAME, abs=0.005)
+
+
+def test_decode_rejects_unknown_version_and_truncated_frame():
+    with pytest.raises(ValueError):
+        decode_frame(base64.b64encode(b"\x07" + bytes(26)).decode())
+    with pytest.raises(ValueError):
+        decode_frame(base64.b64encode(b"\x01" + bytes(10)).decode())
+    with pytest.raises(ValueError):
+        decode_frame("not base64!")
+
+
+def test_sequence_tracker():
+    tracker = SequenceTracker()
+
+    assert tracker.accept(0xFFFE)
+    assert tracker.accept(2)
+    assert tracker.lost == 3
+    assert not tracker.accept(2)
+    assert not tracker.accept(0xFFFF)
+    assert tracker.accept(1000)
+    assert tracker.accept(1)
+    assert tracker.dropped == 2
+
+
+def test_reboot_with_low_sequence_is_accepted():
+    tracker = SequenceTracker()
+    for sequence in range(1, 41):
+        assert tracker.accept(sequence, boot_id=100)
+
+    assert tracker.accept(1, boot_id=2000)
+    assert tracker.accept(2, boot_id=2000)
+    assert not tracker.accept(2, boot_id=2000)
+    assert tracker.restarts == 1
+    assert tracker.lost == 0
+
+
+def test_decode_faster_than_text_parsing():
+    payload = FrameEncoder().encode(FRAME, 0)
+    text = "".join(f"{key}:{value};" for key, value in FRAME.items())
+
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    for _ in range(1000):
+        EnergyManager.parse_string_to_dict(text)
+    text_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        decode_frame(payload)
+    binary_time = time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+
+    assert binary_time * 3 < text_time
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+import numpy as np
+
+from services.heater_simulator import parameter_grid, simulate, synthetic_trace
+
+
+def load_trace(path):
+    """Surplus [W] from a CSV file, one value per line or the last column of every line"""
+    trace = np.loadtxt(path, delimiter=",", ndmin=2)
+    return trace[:, -1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch what-if simulation of heater switching thresholds")
+    parser.add_argument("--trace", help="CSV with recorded surplus [W], synthetic trace when omitted")
+    parser.add_argument("--days", type=float, default=30, help="days of synthetic trace")
+    parser.add_argument("--step", type=float, default=30, help="seconds between trace values")
+    parser.add_argument("--import-weight", type=float, default=1.0, help="penalty of 1 kWh imported in score")
+    parser.add_argument("--switch-weight", type=float, default=0.01, help="penalty of one relay switch in score")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    surplus = load_trace(args.trace) if args.trace else synthetic_trace(days=args.days, step=args.step)
+    grid = parameter_grid(activation_threshold=np.arange(200, 1600, 100),
+                          heater_2000w_off_high=np.linspace(0.5, 1.0, 6),
+                          heater_2000w_off_low=np.linspace(0.1, 0.4, 4),
+                          heater_1000w_off=np.linspace(0.25, 0.75, 6))
+
+    start = time.perf_counter()
+    result = simulate(surplus, step=args.step, **grid)
+    elapsed = time.perf_counter() - start
+    print(f"{len(result['switches'])} combinations x {len(surplus)} steps in {elapsed:.1f} s")
+
+    score = (result["self_consumption"] - args.import_weight * result["grid_import"] -
+             args.switch_weight * result["switches"])
+    print(f"{'threshold':>9} {'2000W hi':>8} {'2000W lo':>8} {'1000W':>6} "
+          f"{'self [kWh]':>10} {'import [kWh]':>12} {'export [kWh]':>12} {'switches':>8}")
+    for index in np.argsort(-score)[:args.top]:
+        print(f"{grid['activation_threshold'][index]:>9.0f} {grid['heater_2000w_off_high'][index]:>8.2f} "
+              f"{grid['heater_2000w_off_low'][index]:>8.2f} {grid['heater_1000w_off'][index]:>6.2f} "
+              f"{result['self_consumption'][index]:>10.1f} {result['grid_import'][index]:>12.1f} "
+              f"{result['export'][index]:>12.1f} {result['switches'][index]:>8}")
+
+
+if __name__ == "__main__":
+    main()
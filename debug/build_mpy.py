@@ -0,0 +1,27 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+# Precompiles grid meter modules to .mpy (needs mpy-cross matching the board firmware: pip install mpy-cross).
+# main.py is copied as source, the board only runs main.py from a .py file.
+# Upload the content of grid_meter/build to the board, e.g.: mpremote cp -r grid_meter/build/. :
+
+SOURCE = Path(__file__).resolve().parent.parent / "grid_meter"
+BUILD = SOURCE / "build"
+PACKAGES = ["services", "settings"]
+
+
+def build():
+    shutil.rmtree(BUILD, ignore_errors=True)
+    BUILD.mkdir()
+    shutil.copy(SOURCE / "main.py", BUILD / "main.py")
+    for package in PACKAGES:
+        (BUILD / package).mkdir()
+        for module in sorted((SOURCE / package).glob("*.py")):
+            output = BUILD / package / module.with_suffix(".mpy").name
+            subprocess.run(["mpy-cross", "-o", str(output), str(module)], check=True)
+            print(f"{module.relative_to(SOURCE)} -> {output.relative_to(SOURCE)}")
+
+
+if __name__ == "__main__":
+    build()
@@ -2,13 +2,21 @@ from machine import UART, Pin
 import utime
 import struct
 import _thread
-import network
 import time
 import logging
 import gc
+import asyncio
 
-from arduino_iot_cloud import ArduinoCloudClient
 from secrets import WIFI_SSID, WIFI_PASSWORD, DEVICE_ID, CLOUD_PASSWORD
+from services.boot_timer import BootTimer
+from services.scheduler import Register, PollScheduler, interleave, FLOAT_WORDS
+from services.frame_buffer import FrameBuffer
+from services.baseline import BaselineStore
+from services.heartbeat import Heartbeat
+from services.anomaly import AnomalyDetector, EVENT_COUNTER_JUMP, event_names
+from services.gateway import RegisterCache, ModbusGateway
+from services.wire import FrameEncoder
+from services.rtu import HOLD_REGISTER_REQUEST, modbus_request
 
 commands = {
     "L1_voltage": [14, 1],
@@ -24,31 +32,76 @@ commands = {
     "Total_reverse_active_energy": [272, 2]
 }
 
-NUM_UART = 0x0
-SLAVE_ADDRESS = 0x0
-HOLD_REGISTER_REQUEST = 0x03
-DEFAULT_REGISTER = 0x0
-DEFAULT_REGISTER_NUM = 0x01
-
-modbus_frame = {
-    "L1_voltage": 0,
-    "L2_voltage": 0,
-    "L3_voltage": 0,
-    "L1_current": 0,
-    "L2_current": 0,
-    "L3_current": 0,
-    "L1_active_power": 0,
-    "L2_active_power": 0,
-    "L3_active_power": 0,
-    "Total_forward_active_energy": [0, 0],
-    "Total_reverse_active_energy": [0, 0]
+# [period in seconds, priority, aligned to multiples of period]
+schedule = {
+    "L1_voltage": [60, 0, False],
+    "L2_voltage": [60, 0, False],
+    "L3_voltage": [60, 0, False],
+    "L1_current": [10, 1, False],
+    "L2_current": [10, 1, False],
+    "L3_current": [10, 1, False],
+    "L1_active_power": [5, 2, False],
+    "L2_active_power": [5, 2, False],
+    "L3_active_power": [5, 2, False],
+    "Total_forward_active_energy": [60, 1, True],
+    "Total_reverse_active_energy": [60, 1, True]
 }
 
+ENERGY_COMMANDS = ("Total_forward_active_energy", "Total_reverse_active_energy")
+
+GRID_METER = "grid"
+
+# meters on the RS-485 bus, every meter has its own slave address, register map and frame
+meters = [
+    {"name": GRID_METER, "slave_addr": 1, "commands": commands, "schedule": schedule},
+    # {"name": "heaters", "slave_addr": 2, "commands": {...}, "schedule": {...}},
+    # {"name": "pv", "slave_addr": 3, "commands": {...}, "schedule": {...}},
+]
+
+NUM_UART = 0x0
+REQUEST_ATTEMPTS = 3
+RESPONSE_TIMEOUT_MS = 1000
+MAX_REGISTER_GAP = 2
+WATCHDOG_INTERVAL = 25
+HEARTBEAT_TIMEOUT = 10  # controller is dead after 10 s without any message from it, as with the 1 s watchdog toggle
+HEARTBEAT_QUIET_FRACTION = 0.3
+MAX_BASELINE_AGE = 900
+NTP_ATTEMPTS = 3
+MAX_IDLE_SLEEP = 1  # [s] acquisition loop wakes up at least this often, for registers forced by the gateway
+FRAME_FORMAT = "binary"  # "binary" - packed grid meter values, "text" - "key:value;" pairs incl. sub-meters
+GATEWAY_ENABLED = False  # Modbus TCP server of cached registers for other consumers of the meters
+GATEWAY_PORT = 502
+GATEWAY_MAX_AGE = 10  # [s] older cached registers are read from the bus again
+GATEWAY_TIMEOUT = 5
+GATEWAY_POLL_INTERVAL = 0.1
+
+
+def create_modbus_frame(meter_commands):
+    frame = {}
+    for command in meter_commands:
+        frame[command] = [0, 0] if command in ENERGY_COMMANDS else 0
+    return frame
+
+
+# two preallocated frames per meter, written by the acquisition thread on core 1 and read by the cloud on core 0
+frame_buffers = {}
+for meter in meters:
+    frame_buffers[meter["name"]] = FrameBuffer(lambda meter_commands=meter["commands"]:
+                                               create_modbus_frame(meter_commands))
+
 modbus_frame_old = {
     "Total_forward_active_energy": [0, 0],
     "Total_reverse_active_energy": [0, 0]
 }
 
+baseline_store = BaselineStore()
+register_cache = RegisterCache()
+schedulers = []
+baseline_saved_time = 0
+# energy readings are stamped 0 until the clock is set from NTP, a diff never spans the step of the clock
+clock_ready = False
+clock_synced = False  # baselines are persisted only with NTP time, otherwise they are discarded on the next boot
+
 watchdog = {
     "wdg_gridmeter_controller": False,
     "wdg_controller_gridmeter": False,
@@ -57,6 +110,19 @@ watchdog = {
     "wdg_controller_gridmeter_failed_counter": 0
 }
 
+
+
+def ticks_elapsed(now, then):
+    return utime.ticks_diff(now, then) / 1000
+
+
+# ticks_ms, not utime.time(), which jumps by years when the cloud sets the clock
+heartbeat = Heartbeat(HEARTBEAT_TIMEOUT, HEARTBEAT_QUIET_FRACTION, now=utime.ticks_ms(), elapsed=ticks_elapsed)
+
+# readings of the grid meter are checked before they reach the frame, events are published as a bitmask
+anomaly_detector = AnomalyDetector()
+published_events = 0
+
 devices = {
     "controller_alive": True,
     "actuatorheaters_alive": True
@@ -66,43 +132,18 @@ diff_reverse_active_energy = 0
 diff_forward_active_energy = 0
 
 grid_meter_frame = ""
+# binary frame is encoded when it is published, frame_version counts frames updated by the acquisition thread
+frame_encoder = FrameEncoder()
+frame_version = 0
+frame_time = 0
+encoded_frame_version = 0
 
-
-def calculate_crc(request_to_crc: bytes) -> bytes:
-    crc = 0xFFFF
-    for i in request_to_crc:
-        crc ^= i
-        for _ in range(8):
-            if crc & 1:
-                crc >>= 1
-                crc ^= 0xA001
-            else:
-                crc >>= 1
-    return crc.to_bytes(2, 'little')
-
-
-def modbus_request(uart, slave_addr=SLAVE_ADDRESS, register_addr=DEFAULT_REGISTER,
-                   num_registers=DEFAULT_REGISTER_NUM, function_code=HOLD_REGISTER_REQUEST):
-    request = bytearray([slave_addr, function_code,
-                         (register_addr >> 8) & 0xFF,
-                         register_addr & 0xFF,
-                         (num_registers >> 8) & 0xFF,
-                         num_registers & 0xFF])
-    crc = calculate_crc(request)
-    request.extend(crc)
-    isResponse = False
-    response = bytes()
-    while not isResponse:
-        uart.write(request)
-        utime.sleep(1)
-        if uart.any():
-            response = uart.read()
-            if response:
-                isResponse = True
-    return response
+boot_timer = BootTimer()
+cloud_connected = False
 
 
 def wifi_connect():
+    import network
     if not WIFI_SSID or not WIFI_PASSWORD:
         raise Exception("Network is not configured. Set SSID and passwords in secrets.py")
     wlan = network.WLAN(network.STA_IF)
@@ -114,151 +155,289 @@ def wifi_connect():
     logging.info(f"WiFi Connected {wlan.ifconfig()}")
 
 
+def sync_clock():
+    """Sets the clock from NTP before energy readings are stamped, then reads the energy counters again"""
+    global clock_ready
+    global clock_synced
+    import ntptime
+    for _ in range(NTP_ATTEMPTS):
+        try:
+            ntptime.settime()
+            clock_synced = True
+            break
+        except OSError as e:
+            logging.warning(f"NTP sync failed: {e}")
+    clock_ready = True  # without NTP the clock at least runs steadily from now on
+    for meter, scheduler in zip(meters, schedulers):
+        if meter["name"] == GRID_METER:
+            scheduler.force(ENERGY_COMMANDS)
+
+
+def binary_frame():
+    return FRAME_FORMAT == "binary" and len(meters) == 1
+
+
 def update_frame():
-    global modbus_frame
     global grid_meter_frame
+    global frame_version
+    global frame_time
+    if binary_frame():
+        frame_time = utime.time()
+        frame_version += 1
+        boot_timer.mark("first_frame")
+        return 0
     grid_meter_frame_local = ""
     for command in ["L1_voltage", "L2_voltage", "L3_voltage",
                     "L1_current", "L2_current", "L3_current",
                     "L1_active_power", "L2_active_power", "L3_active_power"]:
-        value_str = str(modbus_frame[command])
+        value_str = str(frame_buffers[GRID_METER].front()[command])
         grid_meter_frame_local = grid_meter_frame_local + command + ":" + value_str + ";"
+    for meter in meters:
+        if meter["name"] == GRID_METER:
+            continue
+        frame = frame_buffers[meter["name"]].front()
+        for command in meter["commands"]:
+            value = frame[command][0] if command in ENERGY_COMMANDS else frame[command]
+            grid_meter_frame_local = grid_meter_frame_local + meter["name"] + "/" + command + ":" + str(value) + ";"
     grid_meter_frame = grid_meter_frame_local
+    boot_timer.mark("first_frame")
     logging.info(f"Grid Meter Frame: updated - update_frame()")
     return 0
 
 
 def update_frame_cloud(client):
     global grid_meter_frame
+    global cloud_connected
+    # on_read runs from the start of the client, the thing id is set only after the connection and discovery
+    if not cloud_connected and client.thing_id is not None:
+        heartbeat.reset(utime.ticks_ms())
+        cloud_connected = True
+        boot_timer.mark("first_publish")
+        boot_timer.report()
+    if binary_frame() and encoded_frame_version != frame_version:
+        encode_frame()
     return grid_meter_frame
 
 
+def encode_frame():
+    """Binary frame of the latest grid meter values, its sequence number counts the published frames"""
+    global grid_meter_frame
+    global encoded_frame_version
+    encoded_frame_version = frame_version
+    timestamp = frame_time
+    with frame_buffers[GRID_METER] as frame:
+        grid_meter_frame = frame_encoder.encode(frame, timestamp)
+
+
 def update_total_energy_reverse(client):
-    global modbus_frame
-    return modbus_frame["Total_reverse_active_energy"][0]
+    with frame_buffers[GRID_METER] as frame:
+        return frame["Total_reverse_active_energy"][0]
 
 
 def update_energy_reverse_diff(client):
-    global modbus_frame
     global modbus_frame_old
     global diff_reverse_active_energy
     command = "Total_reverse_active_energy"
+    with frame_buffers[GRID_METER] as frame:
+        new_value, new_time = frame[command]
+    if not new_time:  # not read since the clock was set
+        return -1
     logging.info(f"update_energy_reverse_diff")
-    logging.info(f"modbus_frame    : {modbus_frame[command]}")
+    logging.info(f"modbus_frame    : {[new_value, new_time]}")
     logging.info(f"modbus_frame_old: {modbus_frame_old[command]}")
     old_time = modbus_frame_old[command][1]
-    new_time = modbus_frame[command][1]
     old_value = int(modbus_frame_old[command][0])
-    new_value = int(modbus_frame[command][0])
+    new_value = int(new_value)
     diff_time = new_time - old_time
+    if diff_time > MAX_BASELINE_AGE:
+        modbus_frame_old[command] = [new_value, new_time]
+        persist_baseline()
+        return -1
     if diff_time > 0:
         diff_time_norm = int(3600 / diff_time)
         diff_reverse_active_energy = (new_value - old_value) * diff_time_norm
-        modbus_frame_old[command] = modbus_frame[command].copy()
+        modbus_frame_old[command] = [new_value, new_time]
+        persist_baseline()
         logging.info(
             f"diff_reverse_energy: {diff_reverse_active_energy:>5} | {old_value:>10} | {new_value:>10} | {diff_time:>5}")
         if 0 <= diff_reverse_active_energy <= 5100:
             return diff_reverse_active_energy
         else:
+            anomaly_detector.flag(EVENT_COUNTER_JUMP)
             return 0
     else:
         return -1
 
 
 def update_energy_forward_diff(client):
-    global modbus_frame
     global modbus_frame_old
     global diff_forward_active_energy
     command = "Total_forward_active_energy"
+    with frame_buffers[GRID_METER] as frame:
+        new_value, new_time = frame[command]
+    if not new_time:  # not read since the clock was set
+        return -1
     logging.info(f"update_energy_forward_diff")
-    logging.info(f"modbus_frame    : {modbus_frame[command]}")
+    logging.info(f"modbus_frame    : {[new_value, new_time]}")
     logging.info(f"modbus_frame_old: {modbus_frame_old[command]}")
     old_time = modbus_frame_old[command][1]
-    new_time = modbus_frame[command][1]
     old_value = int(modbus_frame_old[command][0])
-    new_value = int(modbus_frame[command][0])
+    new_value = int(new_value)
     diff_time = new_time - old_time
+    if diff_time > MAX_BASELINE_AGE:
+        modbus_frame_old[command] = [new_value, new_time]
+        persist_baseline()
+        return -1
     if diff_time > 0:
         diff_time_norm = int(3600 / diff_time)
         diff_forward_active_energy = (new_value - old_value) * diff_time_norm
-        modbus_frame_old[command] = modbus_frame[command].copy()
+        modbus_frame_old[command] = [new_value, new_time]
+        persist_baseline()
         logging.info(
             f"diff_forward_energy: {diff_forward_active_energy:>5} | {old_value:>10} | {new_value:>10} | {diff_time:>5}")
         if 0 <= diff_forward_active_energy <= 12000:
             return diff_forward_active_energy
         else:
+            anomaly_detector.flag(EVENT_COUNTER_JUMP)
             return 0
     else:
         return -1
 
 
+def update_events(client):
+    global published_events
+    events = anomaly_detector.take_events()
+    if events == 0 and published_events == 0:
+        return None
+    if events:
+        logging.warning(f"Grid meter events: {event_names(events)}")
+    published_events = events
+    return events
+
+
+def published(on_read):
+    """on_read callback which marks the heartbeat as sent, the cloud client publishes every value except None"""
+    def read(client):
+        value = on_read(client)
+        if value is not None:
+            heartbeat.sent(utime.ticks_ms())
+        return value
+    return read
+
+
+def load_baseline():
+    global modbus_frame_old
+    global baseline_saved_time
+    baseline = baseline_store.load()
+    if baseline:
+        modbus_frame_old["Total_forward_active_energy"] = baseline[0]
+        modbus_frame_old["Total_reverse_active_energy"] = baseline[1]
+        baseline_saved_time = min(baseline[0][1], baseline[1][1])
+        logging.info(f"Energy baseline restored: {baseline}")
+
+
+def persist_baseline():
+    """Saves the baseline once both counters moved past the last saved one, one flash write per interval"""
+    global baseline_saved_time
+    forward = modbus_frame_old["Total_forward_active_energy"]
+    reverse = modbus_frame_old["Total_reverse_active_energy"]
+    if clock_synced and min(forward[1], reverse[1]) > baseline_saved_time:
+        try:
+            baseline_store.save(forward, reverse)
+            baseline_saved_time = max(forward[1], reverse[1])
+        except OSError as e:
+            logging.error(f"Energy baseline not saved: {e}")
+
+
 def hard_reset(client, value):
     if value:
         machine.reset()
 
 
+def create_scheduler(meter):
+    registers = []
+    for command, parameter in meter["commands"].items():
+        period, priority, aligned = meter["schedule"][command]
+        registers.append(Register(command, parameter[0], period, priority, aligned))
+    return PollScheduler(registers, max_gap=MAX_REGISTER_GAP)
+
+
+def convert_modbus_data(response, offset=0):
+    data = int.from_bytes(response[3 + offset:7 + offset], 'big')
+    return struct.unpack('>f', struct.pack('>I', data))[0]
+
+
+def store_modbus_value(frame, command, float_value, timestamp):
+    if command in ENERGY_COMMANDS:
+        frame[command][0] = int(float_value * 1000)
+        frame[command][1] = timestamp
+    else:
+        frame[command] = round(float_value, 2)
+
+
+def refresh_registers(slave_addr, start, count):
+    """Gateway: registers of the range are read with the next block read, False when they are not polled"""
+    for meter, scheduler in zip(meters, schedulers):
+        if meter["slave_addr"] != slave_addr:
+            continue
+        registers = [register for register in scheduler.registers
+                     if register.address < start + count and start < register.address + FLOAT_WORDS]
+        covered = [address for register in registers for address in range(register.address,
+                                                                           register.address + FLOAT_WORDS)]
+        if any(address not in covered for address in range(start, start + count)):
+            return False
+        scheduler.force([register.name for register in registers])
+        return True
+    return False
+
+
 def read_modbus_frame():
+    global schedulers
     uart = UART(0, baudrate=9600, bits=8, parity=0, stop=1, tx=Pin(0), rx=Pin(1))
-    state = 0
-    global modbus_frame
-    global grid_meter_frame
+    schedulers = [create_scheduler(meter) for meter in meters]
+    watchdog_timestamp = utime.time()
+    logging.info("FIRST_CYCLE_START - read_modbus_frame()")
+    check_memory()
     while True:
-        if state == 1:
-            time.sleep(25)
-            logging.info("STANDARD CYCLE - read_modbus_frame()")
-            check_memory()
-            for command in ["L1_voltage", "L2_voltage", "L3_voltage",
-                            "L1_current", "L2_current", "L3_current",
-                            "L1_active_power", "L2_active_power", "L3_active_power",
-                            "Total_forward_active_energy", "Total_reverse_active_energy"]:
-                parameter = commands[command]
-                response = None
-                while not response:
-                    response = modbus_request(uart, slave_addr=1, register_addr=parameter[0],
-                                              num_registers=parameter[1], function_code=3)
-                    utime.sleep(0.1)
-                data = int.from_bytes(response[3:7], 'big')
-                float_value = struct.unpack('>f', struct.pack('>I', data))[0]
-                timestamp = utime.time()
-                if command == "Total_forward_active_energy":
-                    modbus_frame[command][0] = int(float_value * 1000)
-                    modbus_frame[command][1] = timestamp
-                elif command == "Total_reverse_active_energy":
-                    modbus_frame[command][0] = int(float_value * 1000)
-                    modbus_frame[command][1] = timestamp
-                else:
-                    modbus_frame[command] = round(float_value, 2)
+        frame_updated = False
+        now = utime.time()
+        requests = interleave([scheduler.due(now) for scheduler in schedulers])
+        frames = {}
+        for index, block in requests:
+            meter = meters[index]
+            if meter["name"] not in frames:
+                frames[meter["name"]] = frame_buffers[meter["name"]].begin()
+            response = modbus_request(uart, slave_addr=meter["slave_addr"], register_addr=block.start,
+                                      num_registers=block.count, function_code=HOLD_REGISTER_REQUEST,
+                                      attempts=REQUEST_ATTEMPTS, timeout_ms=RESPONSE_TIMEOUT_MS)
+            synced = clock_ready  # read before the time, so a reading stamped as synced has the time set by NTP
+            timestamp = utime.time()
+            schedulers[index].mark_read(block, timestamp)
+            if not response:
+                continue
+            register_cache.store(meter["slave_addr"], block.start, response[3:3 + 2 * block.count], timestamp)
+            frame = frames[meter["name"]]
+            for register in block.registers:
+                value = convert_modbus_data(response, block.offset(register))
+                if meter["name"] == GRID_METER:
+                    value = anomaly_detector.check(register.name, value, timestamp)
+                    if value is None:
+                        continue
+                store_modbus_value(frame, register.name, value, timestamp if synced else 0)
+                if register.name not in ENERGY_COMMANDS or meter["name"] != GRID_METER:
+                    frame_updated = True
+        for name in frames:
+            frame_buffers[name].publish()
+        if frame_updated:
             update_frame()
-        elif state == 0:
-            logging.info("FIRST_CYCLE_START - read_modbus_frame()")
+        if utime.time() - watchdog_timestamp >= WATCHDOG_INTERVAL:
+            watchdog_timestamp = utime.time()
+            logging.info("STANDARD CYCLE - read_modbus_frame()")
             check_memory()
-            for command in ["L1_voltage", "L2_voltage", "L3_voltage",
-                            "L1_current", "L2_current", "L3_current",
-                            "L1_active_power", "L2_active_power", "L3_active_power",
-                            "Total_forward_active_energy", "Total_reverse_active_energy"]:
-
-                parameter = commands[command]
-
-                response = None
-                while not response:
-                    response = modbus_request(uart, slave_addr=1, register_addr=parameter[0],
-                                              num_registers=parameter[1], function_code=3)
-                    utime.sleep(0.1)
-                data = int.from_bytes(response[3:7], 'big')
-                float_value = struct.unpack('>f', struct.pack('>I', data))[0]
-                timestamp = utime.time()
-                if command == "Total_forward_active_energy":
-                    modbus_frame[command][0] = int(float_value * 1000)
-                    modbus_frame[command][1] = timestamp
-                elif command == "Total_reverse_active_energy":
-                    modbus_frame[command][0] = int(float_value * 1000)
-                    modbus_frame[command][1] = timestamp
-                else:
-                    modbus_frame[command] = round(float_value, 2)
-            state = 1
-            update_frame()
-        utime.sleep(1)
-        run_watchdog()
+            if cloud_connected:  # controller heartbeat can only arrive once the cloud is connected
+                run_watchdog()
+        next_due = min(scheduler.next_due() for scheduler in schedulers)
+        utime.sleep(max(0.1, min(next_due - utime.time(), MAX_IDLE_SLEEP)))
 
 
 def check_memory():
@@ -273,6 +452,9 @@ def check_memory():
 
 def update_wdg_gridmeter_controller(client):
     global watchdog
+    # frames and energy diffs prove liveness too, explicit heartbeat only on a quiet link
+    if not heartbeat.due(utime.ticks_ms()):
+        return None
     watchdog['wdg_gridmeter_controller'] = not watchdog['wdg_gridmeter_controller']
     return watchdog['wdg_gridmeter_controller']
 
@@ -281,15 +463,17 @@ def check_wdg_controller_gridmeter(client, value):
     global watchdog
     watchdog['wdg_controller_gridmeter'] = value
     watchdog['wdg_controller_gridmeter_counter'] += 1
+    heartbeat.received(utime.ticks_ms())
 
 
 def run_watchdog():
     global watchdog
     global devices
-    if watchdog['wdg_controller_gridmeter_counter'] != watchdog['wdg_controller_gridmeter_counter_old']:
+    if heartbeat.alive(utime.ticks_ms()):
         watchdog['wdg_controller_gridmeter_counter_old'] = watchdog['wdg_controller_gridmeter_counter']
         devices['controller_alive'] = True
-        logging.info(f"[WATCHDOG] CONTROLLER ALIVE: {devices['controller_alive']}")
+        logging.info(f"[WATCHDOG] CONTROLLER ALIVE: {devices['controller_alive']} | heartbeats sent: "
+                     f"{heartbeat.heartbeats} | interval: {heartbeat.interval():.0f} s")
     else:
         devices["controller_alive"] = False
         logging.info(f"[WATCHDOG] CONTROLLER ALIVE: {devices['controller_alive']}")
@@ -305,22 +489,55 @@ def run_watchdog():
         machine.reset()
 
 
+async def serve_gateway(gateway):
+    """Modbus TCP gateway on core 0, a task of its own so it serves local clients while the cloud is down"""
+    while True:
+        gateway.poll()
+        await asyncio.sleep(GATEWAY_POLL_INTERVAL)
+
+
+async def run_tasks(client, gateway):
+    # client.run() is the coroutine behind start(), the library is pinned as on the controller (run_sites.py)
+    tasks = [client.run(1.0, 1.2)]
+    if gateway is not None:
+        tasks.append(serve_gateway(gateway))
+    await asyncio.gather(*tasks)
+
+
 def main():
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
-    time.sleep(5)
+    load_baseline()
     try:
+        # acquisition starts first, on RP2040 the new thread runs on the second core (core 1)
+        _thread.start_new_thread(read_modbus_frame, ())
+        boot_timer.mark("acquisition")
         wifi_connect()
+        boot_timer.mark("wifi")
+        gateway = None
+        if GATEWAY_ENABLED:
+            # listens from now on, requests are answered as soon as the tasks run, connected to the cloud or not
+            gateway = ModbusGateway(register_cache, refresh_registers, utime.time, GATEWAY_PORT, GATEWAY_MAX_AGE,
+                                    GATEWAY_TIMEOUT)
+            gateway.start()
+        sync_clock()
+        boot_timer.mark("clock")
+        from arduino_iot_cloud import ArduinoCloudClient
         client = ArduinoCloudClient(device_id=DEVICE_ID, username=DEVICE_ID, password=CLOUD_PASSWORD, sync_mode=False)
-        _thread.start_new_thread(read_modbus_frame, ())
+        boot_timer.mark("cloud_client")
 
-        client.register("grid_meter_frame", value="", on_read=update_frame_cloud, interval=30.0)
-        client.register("energy_forward_diff", value=0, on_read=update_energy_forward_diff, interval=120)
-        client.register("energy_reverse_diff", value=0, on_read=update_energy_reverse_diff, interval=120)
+        client.register("grid_meter_frame", value="", interval=30.0,
+                        on_read=published(update_frame_cloud))
+        client.register("energy_forward_diff", value=0, interval=120,
+                        on_read=published(update_energy_forward_diff))
+        client.register("energy_reverse_diff", value=0, interval=120,
+                        on_read=published(update_energy_reverse_diff))
+        client.register("grid_meter_events", value=0, interval=30.0,
+                        on_read=published(update_events))
 
         client.register("wdg_gridmeter_controller", value=False, on_read=update_wdg_gridmeter_controller, interval=1)
         client.register("wdg_controller_gridmeter", value=False, on_write=check_wdg_controller_gridmeter)
 
-        client.start()
+        asyncio.run(run_tasks(client, gateway))
 
     except Exception as e:
         logging.error(e)
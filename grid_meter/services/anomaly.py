@@ -0,0 +1,179 @@
+import _thread
+
+EVENT_VOLTAGE_SAG = 0x01
+EVENT_VOLTAGE_SWELL = 0x02
+EVENT_PHASE_IMBALANCE = 0x04
+EVENT_STUCK_REGISTER = 0x08
+EVENT_COUNTER_JUMP = 0x10
+EVENT_SPIKE = 0x20
+
+EVENT_NAMES = {
+    EVENT_VOLTAGE_SAG: "voltage_sag",
+    EVENT_VOLTAGE_SWELL: "voltage_swell",
+    EVENT_PHASE_IMBALANCE: "phase_imbalance",
+    EVENT_STUCK_REGISTER: "stuck_register",
+    EVENT_COUNTER_JUMP: "counter_jump",
+    EVENT_SPIKE: "spike"
+}
+
+
+def event_names(events):
+    return [name for code, name in EVENT_NAMES.items() if events & code]
+
+
+class Welford:
+    """Running mean and variance of all accepted samples"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def std(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+
+class HampelFilter:
+    """Outlier filter: a sample further than sigmas * scale from the median of the last window samples.
+
+    The scale is the MAD of the window, or the running standard deviation when the window is flat,
+    but at least min_scale. Every raw sample enters the window, so a real step of the signal is accepted
+    after half of the window.
+    """
+
+    def __init__(self, window=7, sigmas=3.0, min_scale=0.0):
+        self.window = [0.0] * window
+        self.index = 0
+        self.count = 0
+        self.sigmas = sigmas
+        self.min_scale = min_scale
+        self.stats = Welford()
+
+    def check(self, value):
+        """Returns the value for the control path (median of the window for an outlier) and outlier flag"""
+        outlier = False
+        result = value
+        size = len(self.window)
+        if self.count >= size:
+            ordered = sorted(self.window)
+            median = ordered[size // 2]
+            deviations = sorted([abs(sample - median) for sample in self.window])
+            scale = 1.4826 * deviations[size // 2] or self.stats.std()
+            if abs(value - median) > self.sigmas * max(scale, self.min_scale):
+                outlier = True
+                result = median
+        if not outlier:
+            self.stats.add(value)
+        self.window[self.index] = value
+        self.index = (self.index + 1) % size
+        self.count += 1
+        return result, outlier
+
+
+class AnomalyDetector:
+    """O(1) per sample checks of the grid meter readings.
+
+    Voltages are checked for sags, swells and imbalance of phases, voltages, currents and powers for spikes
+    (Hampel filter) and stuck registers, energy counters for implausible jumps. Detected events are
+    accumulated as a bitmask of EVENT_* codes until take_events(), events are flagged by both cores, so the
+    bitmask is lock-protected. check() returns the value for the control path: the median instead of a spike,
+    None for a rejected counter sample or a stuck register, which then keeps its last value.
+    """
+
+    def __init__(self, nominal_voltage=230.0, voltage_tolerance=0.1, imbalance_limit=0.05, stuck_samples=12,
+                 max_power=45000, counter_resolution=0.02, max_rejected=5, min_scales=None, limit=1e6):
+        # voltage_tolerance  - relative deviation from nominal voltage which is a sag / swell (EN 50160: 10 %)
+        # imbalance_limit    - (max - min) / mean of phase voltages, a healthy grid has a spread of a few percent
+        # stuck_samples      - consecutive identical non-zero readings of a register
+        # max_power          - [W] highest plausible power, limits increase of energy counters [kWh]
+        # counter_resolution - [kWh] allowed error of an energy counter increase
+        # max_rejected       - consecutive rejected counter samples after which the counter is resynchronised
+        # min_scales         - {suffix of register name: lowest scale of Hampel filter}
+        # limit              - absolute value above which a reading is garbage (e.g. misaligned float)
+        self.sag_limit = nominal_voltage * (1 - voltage_tolerance)
+        self.swell_limit = nominal_voltage * (1 + voltage_tolerance)
+        self.imbalance_limit = imbalance_limit
+        self.stuck_samples = stuck_samples
+        self.max_power = max_power
+        self.counter_resolution = counter_resolution
+        self.max_rejected = max_rejected
+        self.min_scales = min_scales or {"_voltage": 2.0, "_current": 10.0, "_active_power": 2500.0}
+        self.limit = limit
+        self.events = 0
+        self._lock = _thread.allocate_lock()
+        self.filters = {}
+        self.repeats = {}
+        self.voltages = {}
+        self.counters = {}
+
+    def flag(self, event):
+        with self._lock:
+            self.events |= event
+
+    def take_events(self):
+        with self._lock:
+            events = self.events
+            self.events = 0
+        return events
+
+    def check(self, name, value, timestamp):
+        if value != value or abs(value) > self.limit:
+            self.flag(EVENT_SPIKE)
+            return None
+        if name.startswith("Total_"):
+            return self.check_counter(name, value, timestamp)
+        if self.check_stuck(name, value):
+            return None
+        if name.endswith("_voltage"):
+            self.check_voltage(name, value)
+        for suffix, min_scale in self.min_scales.items():
+            if name.endswith(suffix):
+                if name not in self.filters:
+                    self.filters[name] = HampelFilter(min_scale=min_scale)
+                value, outlier = self.filters[name].check(value)
+                if outlier:
+                    self.flag(EVENT_SPIKE)
+        return value
+
+    def check_stuck(self, name, value):
+        last, count = self.repeats.get(name, (None, 0))
+        count = count + 1 if value == last and value != 0 else 0
+        self.repeats[name] = (value, count)
+        if count + 1 >= self.stuck_samples:
+            self.flag(EVENT_STUCK_REGISTER)
+            return True
+        return False
+
+    def check_voltage(self, name, value):
+        if value < self.sag_limit:
+            self.flag(EVENT_VOLTAGE_SAG)
+        elif value > self.swell_limit:
+            self.flag(EVENT_VOLTAGE_SWELL)
+        self.voltages[name] = value
+        if len(self.voltages) == 3:
+            highest = max(self.voltages.values())
+            lowest = min(self.voltages.values())
+            mean = sum(self.voltages.values()) / 3
+            if mean > 0 and (highest - lowest) / mean > self.imbalance_limit:
+                self.flag(EVENT_PHASE_IMBALANCE)
+
+    def check_counter(self, name, value, timestamp):
+        """Energy counter [kWh] may only grow, by at most max_power since its last accepted sample"""
+        if name not in self.counters:
+            self.counters[name] = [value, timestamp, 0]
+            return value
+        counter = self.counters[name]
+        increase = value - counter[0]
+        max_increase = self.max_power * max(timestamp - counter[1], 1) / 3600000 + self.counter_resolution
+        if -self.counter_resolution <= increase <= max_increase or counter[2] >= self.max_rejected:
+            counter[0], counter[1], counter[2] = value, timestamp, 0
+            return value
+        counter[2] += 1
+        self.flag(EVENT_COUNTER_JUMP)
+        return None
@@ -0,0 +1,64 @@
+import struct
+
+RECORD_FORMAT = "<IiIiI"  # sequence, forward energy [Wh], forward timestamp, reverse energy [Wh], reverse timestamp
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT) + 2  # record + CRC16
+
+
+def calculate_crc(data: bytes) -> int:
+    crc = 0xFFFF
+    for i in data:
+        crc ^= i
+        for _ in range(8):
+            if crc & 1:
+                crc >>= 1
+                crc ^= 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+class BaselineStore:
+    """Energy counter baseline kept in flash as a ring of fixed-size binary records.
+
+    Every save goes to the next slot of the ring, so the writes are spread over the whole file
+    and a torn write only ever loses the newest record. The newest valid record wins on load.
+    """
+
+    def __init__(self, path="baseline.bin", slots=32):
+        self.path = path
+        self.slots = slots
+        self.sequence = 0
+
+    def load(self):
+        """Returns the newest baseline as [[forward, timestamp], [reverse, timestamp]] or None"""
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        newest = None
+        for slot in range(min(self.slots, len(data) // RECORD_SIZE)):
+            record = data[slot * RECORD_SIZE:(slot + 1) * RECORD_SIZE]
+            if struct.unpack("<H", record[-2:])[0] != calculate_crc(record[:-2]):
+                continue
+            values = struct.unpack(RECORD_FORMAT, record[:-2])
+            if values[0] and (newest is None or values[0] > newest[0]):
+                newest = values
+        if newest is None:
+            return None
+        self.sequence = newest[0]
+        return [[newest[1], newest[2]], [newest[3], newest[4]]]
+
+    def save(self, forward, reverse):
+        """Writes the baseline into the next slot of the ring"""
+        self.sequence += 1
+        record = struct.pack(RECORD_FORMAT, self.sequence, forward[0], forward[1], reverse[0], reverse[1])
+        record += struct.pack("<H", calculate_crc(record))
+        try:
+            file = open(self.path, "r+b")
+        except OSError:
+            file = open(self.path, "wb")
+            file.write(bytes(RECORD_SIZE * self.slots))
+        with file:
+            file.seek((self.sequence % self.slots) * RECORD_SIZE)
+            file.write(record)
@@ -0,0 +1,21 @@
+import logging
+import utime
+
+
+class BootTimer:
+    """Startup timing report: time of the first occurrence of every startup stage since boot"""
+
+    def __init__(self):
+        self.start = utime.ticks_ms()
+        self.stages = {}
+
+    def mark(self, stage):
+        if stage in self.stages:
+            return
+        self.stages[stage] = utime.ticks_diff(utime.ticks_ms(), self.start)
+        logging.info(f"[BOOT] {stage:<16} {self.stages[stage]:>8} ms")
+
+    def report(self):
+        summary = " | ".join([f"{stage}: {elapsed} ms" for stage, elapsed in self.stages.items()])
+        logging.info(f"[BOOT] startup report - {summary}")
+        return summary
@@ -0,0 +1,42 @@
+import _thread
+
+
+class FrameBuffer:
+    """Double-buffered frame shared between the acquisition thread and the cloud callbacks.
+
+    The acquisition side writes into the back buffer and publishes it with a lock-protected index flip.
+    The reading side holds the lock only while it reads the front buffer, so the writer never flips
+    a buffer that is being read and the reader always sees a complete frame.
+    """
+
+    def __init__(self, create_frame):
+        self._buffers = [create_frame(), create_frame()]
+        self._front = 0
+        self._lock = _thread.allocate_lock()
+
+    def begin(self):
+        """Writer: returns the back buffer brought up to date with the published frame"""
+        front = self._buffers[self._front]
+        back = self._buffers[1 - self._front]
+        for key, value in front.items():
+            if isinstance(value, list):
+                back[key][:] = value
+            else:
+                back[key] = value
+        return back
+
+    def publish(self):
+        """Writer: makes the back buffer the front one"""
+        with self._lock:
+            self._front = 1 - self._front
+
+    def front(self):
+        """Writer: the published frame, the writer is the only one who flips so no lock is needed"""
+        return self._buffers[self._front]
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self._buffers[self._front]
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._lock.release()
@@ -0,0 +1,202 @@
+import logging
+import socket
+import struct
+import _thread
+
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04  # age [s] of every cached holding register
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+TARGET_FAILED = 0x0B
+MAX_COUNT = 125
+MAX_AGE_REGISTER = 0xFFFF
+
+
+class RegisterCache:
+    """Raw 16-bit words read from the meters, with the time of their reading, shared with the acquisition thread"""
+
+    def __init__(self):
+        self._words = {}  # (slave address, register address) -> (2 bytes, timestamp)
+        self._lock = _thread.allocate_lock()
+
+    def store(self, slave_addr, start, data, timestamp):
+        """Stores data part of a block response (2 bytes per register) starting at register start"""
+        with self._lock:
+            for index in range(len(data) // 2):
+                self._words[(slave_addr, start + index)] = (data[2 * index:2 * index + 2], timestamp)
+
+    def read(self, slave_addr, start, count, now, max_age):
+        """Words of the registers when all of them are cached and younger than max_age, otherwise None"""
+        data = bytearray()
+        with self._lock:
+            for address in range(start, start + count):
+                word = self._words.get((slave_addr, address))
+                if word is None or now - word[1] > max_age:
+                    return None
+                data += word[0]
+        return bytes(data)
+
+    def ages(self, slave_addr, start, count, now):
+        """Age [s] of every register, MAX_AGE_REGISTER for one never read"""
+        data = bytearray()
+        with self._lock:
+            for address in range(start, start + count):
+                word = self._words.get((slave_addr, address))
+                age = MAX_AGE_REGISTER if word is None else min(int(now - word[1]), MAX_AGE_REGISTER)
+                data += struct.pack(">H", age)
+        return bytes(data)
+
+
+class ModbusGateway:
+    """Modbus TCP server answering from the register cache, the RS-485 bus is read only by the acquisition thread.
+
+    A request for registers missing in the cache or older than max_age calls refresh(slave_addr, start, count),
+    which makes the acquisition thread read them with its next block read. A request for registers already
+    being refreshed for other requests waits for the same bus read, only registers not covered by any pending
+    request are refreshed. Waiting requests are answered together, or with an exception after timeout.
+    poll() must be called periodically, it never blocks.
+    """
+
+    def __init__(self, cache, refresh, clock, port=502, max_age=10, timeout=5, max_clients=4):
+        # refresh - callback returning False for registers which are not read from the meter
+        # clock   - time source in seconds, the same as timestamps of the cache
+        self.cache = cache
+        self.refresh = refresh
+        self.clock = clock
+        self.port = port
+        self.max_age = max_age
+        self.timeout = timeout
+        self.max_clients = max_clients
+        self.server = None
+        self.clients = {}  # socket -> received bytes
+        # (slave, start, count) -> [time of request, [(socket, transaction, function, start, count)]]
+        self.pending = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "refreshes": 0, "coalesced": 0, "timeouts": 0}
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("0.0.0.0", self.port))
+        self.server.listen(self.max_clients)
+        self.server.setblocking(False)
+        logging.info(f"Modbus gateway listening on port {self.port}")
+
+    def poll(self):
+        """Accepts clients, answers complete requests and pending requests with refreshed registers"""
+        self.accept()
+        for client in list(self.clients):
+            self.receive(client)
+        self.answer_pending()
+
+    def accept(self):
+        try:
+            client, _ = self.server.accept()
+        except OSError:
+            return
+        if len(self.clients) >= self.max_clients:
+            client.close()
+            return
+        client.setblocking(False)
+        self.clients[client] = b""
+
+    def receive(self, client):
+        try:
+            data = client.recv(256)
+        except OSError:
+            return
+        if not data:
+            self.close(client)
+            return
+        buffer = self.clients[client] + data
+        # MBAP header: transaction, protocol, length of unit + PDU, unit
+        while len(buffer) >= 7:
+            length = struct.unpack(">H", buffer[4:6])[0]
+            if len(buffer) < 6 + length:
+                break
+            self.handle(client, buffer[:6 + length])
+            buffer = buffer[6 + length:]
+        if client in self.clients:
+            self.clients[client] = buffer
+
+    def handle(self, client, frame):
+        transaction, protocol, length, unit = struct.unpack(">HHHB", frame[:7])
+        if protocol != 0 or length < 2:
+            self.close(client)
+            return
+        function = frame[7]
+        if length != 6 or function not in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            self.send(client, transaction, unit, struct.pack(">BB", function | 0x80, ILLEGAL_FUNCTION))
+            return
+        start, count = struct.unpack(">HH", frame[8:12])
+        self.stats["requests"] += 1
+        response = self.request(unit, function, start, count, client, transaction)
+        if response is not None:
+            self.send(client, transaction, unit, response)
+
+    def request(self, unit, function, start, count, client=None, transaction=0):
+        """PDU of the response, None when the request waits for a bus read"""
+        if function not in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            return struct.pack(">BB", function | 0x80, ILLEGAL_FUNCTION)
+        if not 1 <= count <= MAX_COUNT:
+            return struct.pack(">BB", function | 0x80, ILLEGAL_DATA_ADDRESS)
+        now = self.clock()
+        if function == READ_INPUT_REGISTERS:
+            return self.response(function, self.cache.ages(unit, start, count, now))
+        data = self.cache.read(unit, start, count, now, self.max_age)
+        if data is not None:
+            self.stats["cache_hits"] += 1
+            return self.response(function, data)
+        waiter = (client, transaction, function, start, count)
+        for (pending_unit, pending_start, pending_count), entry in self.pending.items():
+            if pending_unit == unit and pending_start <= start and start + count <= pending_start + pending_count:
+                self.stats["coalesced"] += 1
+                entry[1].append(waiter)
+                return None
+        uncovered = [address for address in range(start, start + count) if not self.is_pending(unit, address)]
+        if uncovered:
+            if not self.refresh(unit, uncovered[0], uncovered[-1] + 1 - uncovered[0]):
+                return struct.pack(">BB", function | 0x80, ILLEGAL_DATA_ADDRESS)
+            self.stats["refreshes"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        self.pending[(unit, start, count)] = [now, [waiter]]
+        return None
+
+    def is_pending(self, unit, address):
+        return any(pending_unit == unit and pending_start <= address < pending_start + pending_count
+                   for pending_unit, pending_start, pending_count in self.pending)
+
+    def answer_pending(self):
+        now = self.clock()
+        for key in list(self.pending):
+            unit, start, count = key
+            requested, waiting = self.pending[key]
+            # registers read after the request, so a value older than the request is never used
+            data = self.cache.read(unit, start, count, now, now - requested)
+            if data is None and now - requested < self.timeout:
+                continue
+            if data is None:
+                self.stats["timeouts"] += 1
+            del self.pending[key]
+            for client, transaction, function, first, length in waiting:
+                if data is None:
+                    response = struct.pack(">BB", function | 0x80, TARGET_FAILED)
+                else:
+                    offset = 2 * (first - start)
+                    response = self.response(function, data[offset:offset + 2 * length])
+                if client in self.clients:
+                    self.send(client, transaction, unit, response)
+
+    @staticmethod
+    def response(function, data):
+        return struct.pack(">BB", function, len(data)) + data
+
+    def send(self, client, transaction, unit, pdu):
+        try:
+            client.send(struct.pack(">HHHB", transaction, 0, len(pdu) + 1, unit) + pdu)
+        except OSError:
+            self.close(client)
+
+    def close(self, client):
+        self.clients.pop(client, None)
+        client.close()
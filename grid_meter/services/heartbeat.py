@@ -0,0 +1,61 @@
+def elapsed_seconds(now, then):
+    return now - then
+
+
+class Heartbeat:
+    """Liveness of the peer board inferred from any message received from it.
+
+    An explicit heartbeat is needed only when nothing has been sent to the peer for quiet_fraction of
+    the failure timeout. Arrivals later than that nominal interval show the delay of the link, the interval
+    is shortened by their smoothed value and deviation (as the TCP retransmission timeout), so a slow link
+    gets heartbeats earlier. Times are read from a monotonic clock by the caller, elapsed(now, then) returns
+    seconds between two of them (e.g. utime.ticks_diff of ticks_ms, which wrap around).
+    """
+
+    def __init__(self, timeout, quiet_fraction=0.3, min_interval=1, now=0, elapsed=elapsed_seconds):
+        # timeout        - [s] peer is dead when nothing has been received from it for timeout
+        # quiet_fraction - part of timeout the link may be quiet before an explicit heartbeat is sent
+        # min_interval   - [s] shortest interval between two explicit heartbeats
+        self.timeout = timeout
+        self.nominal_interval = quiet_fraction * timeout
+        self.min_interval = min_interval
+        self.elapsed = elapsed
+        self.last_received = now
+        self.first_received = False
+        self.last_sent = None
+        self.delay_mean = 0.0
+        self.delay_deviation = 0.0
+        self.heartbeats = 0
+
+    def received(self, now):
+        gap = self.elapsed(now, self.last_received)
+        self.last_received = now
+        # the first gap is measured from start, a gap over timeout is an outage, not a delay of the link
+        if not self.first_received or gap >= self.timeout:
+            self.first_received = True
+            return
+        delay = max(gap - self.nominal_interval, 0)
+        self.delay_deviation += (abs(delay - self.delay_mean) - self.delay_deviation) / 4
+        self.delay_mean += (delay - self.delay_mean) / 8
+
+    def reset(self, now):
+        """Nothing can be received before now, e.g. before the cloud connection"""
+        self.last_received = now
+        self.first_received = False
+
+    def sent(self, now):
+        self.last_sent = now
+
+    def interval(self):
+        return max(self.min_interval, self.nominal_interval - self.delay_mean - 4 * self.delay_deviation)
+
+    def due(self, now):
+        """True when an explicit heartbeat must be sent now, it is then counted as sent"""
+        if self.last_sent is not None and self.elapsed(now, self.last_sent) < self.interval():
+            return False
+        self.last_sent = now
+        self.heartbeats += 1
+        return True
+
+    def alive(self, now):
+        return self.elapsed(now, self.last_received) < self.timeout
@@ -0,0 +1,77 @@
+import logging
+import utime
+
+HOLD_REGISTER_REQUEST = 0x03
+EXCEPTION_FLAG = 0x80
+EXCEPTION_FRAME_LENGTH = 5
+
+
+def calculate_crc(request_to_crc: bytes) -> bytes:
+    crc = 0xFFFF
+    for i in request_to_crc:
+        crc ^= i
+        for _ in range(8):
+            if crc & 1:
+                crc >>= 1
+                crc ^= 0xA001
+            else:
+                crc >>= 1
+    return crc.to_bytes(2, 'little')
+
+
+def modbus_request(uart, slave_addr, register_addr, num_registers, function_code=HOLD_REGISTER_REQUEST,
+                   attempts=3, timeout_ms=1000):
+    request = bytearray([slave_addr, function_code,
+                         (register_addr >> 8) & 0xFF,
+                         register_addr & 0xFF,
+                         (num_registers >> 8) & 0xFF,
+                         num_registers & 0xFF])
+    crc = calculate_crc(request)
+    request.extend(crc)
+    for _ in range(attempts):
+        while uart.any():
+            uart.read()
+        uart.write(request)
+        response = read_response(uart, timeout_ms)
+        if is_valid_response(response, slave_addr, function_code):
+            return response
+        if is_exception_response(response, slave_addr, function_code):
+            # the slave answered, asking again gives the same exception
+            logging.warning(f"Exception {response[2]} from slave {slave_addr}, register {register_addr}")
+            return bytes()
+    logging.warning(f"No response from slave {slave_addr}, register {register_addr}")
+    return bytes()
+
+
+def read_response(uart, timeout_ms):
+    """Reads until the frame length given by the byte count field is received, instead of a fixed delay"""
+    response = b""
+    start = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), start) < timeout_ms:
+        if uart.any():
+            response += uart.read()
+            if len(response) >= 5 and len(response) >= response_length(response):
+                break
+        else:
+            utime.sleep_ms(10)
+    return response
+
+
+def response_length(response):
+    if response[1] & EXCEPTION_FLAG:
+        return EXCEPTION_FRAME_LENGTH
+    return response[2] + 5
+
+
+def is_valid_response(response, slave_addr, function_code):
+    if len(response) < 5 or response[0] != slave_addr or response[1] != function_code:
+        return False
+    length = response_length(response)
+    return len(response) >= length and calculate_crc(response[:length - 2]) == response[length - 2:length]
+
+
+def is_exception_response(response, slave_addr, function_code):
+    if len(response) < EXCEPTION_FRAME_LENGTH or response[0] != slave_addr:
+        return False
+    return (response[1] == function_code | EXCEPTION_FLAG
+            and calculate_crc(response[:3]) == response[3:EXCEPTION_FRAME_LENGTH])
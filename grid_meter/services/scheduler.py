@@ -0,0 +1,97 @@
+import _thread
+
+FLOAT_WORDS = 2  # float32 value occupies two 16-bit holding registers
+
+
+class Register:
+    def __init__(self, name, address, period, priority=0, aligned=False):
+        # period   - seconds between two reads of the register
+        # priority - higher value is read first when several blocks are due
+        # aligned  - due times are multiples of period (e.g. aligned with cloud publishing interval)
+        self.name = name
+        self.address = address
+        self.period = period
+        self.priority = priority
+        self.aligned = aligned
+        self.next_due = 0
+
+
+class Block:
+    def __init__(self, start, registers):
+        self.start = start
+        self.registers = registers
+        self.count = registers[-1].address + FLOAT_WORDS - start
+        self.priority = max(register.priority for register in registers)
+
+    def offset(self, register):
+        """Byte offset of the register value in the data part of the block response"""
+        return (register.address - self.start) * 2
+
+
+class PollScheduler:
+    """Block reads of the registers which are due.
+
+    The acquisition thread reads the schedule on core 1 while force() is called from the cloud on core 0,
+    every access to the due times of the registers holds a lock, as in FrameBuffer.
+    """
+
+    def __init__(self, registers, max_gap=0, max_count=32):
+        # max_gap   - unused words allowed between two registers merged into one block
+        # max_count - upper limit of words requested in a single block read
+        self.registers = sorted(registers, key=lambda register: register.address)
+        self.max_gap = max_gap
+        self.max_count = max_count
+        self._lock = _thread.allocate_lock()
+
+    def due(self, now):
+        """Returns the blocks which must be read now, highest priority first"""
+        with self._lock:
+            due_registers = [register for register in self.registers if register.next_due <= now]
+        blocks = []
+        group = []
+        for register in due_registers:
+            if group and (register.address - (group[-1].address + FLOAT_WORDS) > self.max_gap or
+                          register.address + FLOAT_WORDS - group[0].address > self.max_count):
+                blocks.append(Block(group[0].address, group))
+                group = []
+            group.append(register)
+        if group:
+            blocks.append(Block(group[0].address, group))
+        blocks.sort(key=lambda block: -block.priority)
+        return blocks
+
+    def mark_read(self, block, now):
+        """Schedules the next read of all registers of the block"""
+        with self._lock:
+            for register in block.registers:
+                if register.aligned:
+                    register.next_due = (int(now) // register.period + 1) * register.period
+                else:
+                    register.next_due = now + register.period
+
+    def force(self, names):
+        """Makes the registers due immediately"""
+        with self._lock:
+            for register in self.registers:
+                if register.name in names:
+                    register.next_due = 0
+
+    def next_due(self):
+        """Time of the closest scheduled read"""
+        with self._lock:
+            return min(register.next_due for register in self.registers)
+
+
+def interleave(block_lists):
+    """Round-robin merge of due blocks of several slaves, so no slave waits for all blocks of another one"""
+    requests = []
+    index = 0
+    pending = True
+    while pending:
+        pending = False
+        for slave, blocks in enumerate(block_lists):
+            if index < len(blocks):
+                requests.append((slave, blocks[index]))
+                pending = True
+        index += 1
+    return requests
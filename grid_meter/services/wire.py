@@ -0,0 +1,42 @@
+import binascii
+import random
+import struct
+
+WIRE_VERSION = 1
+# version, boot id, sequence, timestamp [s], voltages [0.01 V], currents [0.01 A], active powers [W]
+WIRE_FORMAT = "<BHHI3H3h3h"
+WIRE_FIELDS = ("L1_voltage", "L2_voltage", "L3_voltage",
+               "L1_current", "L2_current", "L3_current",
+               "L1_active_power", "L2_active_power", "L3_active_power")
+WIRE_SCALES = (100, 100, 100, 100, 100, 100, 1, 1, 1)
+WIRE_LIMITS = ((0, 0xFFFF),) * 3 + ((-0x8000, 0x7FFF),) * 6
+WIRE_SIZE = struct.calcsize(WIRE_FORMAT)
+
+
+def scaled(value, scale, low, high):
+    """Fixed point value, saturated to the range of the field"""
+    return min(max(int(round(value * scale)), low), high)
+
+
+class FrameEncoder:
+    """Packed binary grid meter frame, base64 wrapped for the cloud string property.
+
+    The nine values are sent in fixed order as scaled integers, with the format version, a random boot id,
+    a 16-bit sequence number and the reading time, 27 bytes (36 characters) instead of ~200 characters of
+    the text frame. encode() is called once per published frame, so the receiver counts lost frames from
+    gaps of the sequence and recognises a restart of the board by a new boot id.
+    The buffer is allocated once and reused by every encode().
+    """
+
+    def __init__(self, boot_id=None):
+        self.buffer = bytearray(WIRE_SIZE)
+        self.boot_id = random.getrandbits(16) if boot_id is None else boot_id
+        self.sequence = 0
+
+    def encode(self, frame, timestamp):
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        values = [scaled(frame[field], scale, limits[0], limits[1])
+                  for field, scale, limits in zip(WIRE_FIELDS, WIRE_SCALES, WIRE_LIMITS)]
+        struct.pack_into(WIRE_FORMAT, self.buffer, 0, WIRE_VERSION, self.boot_id, self.sequence,
+                         int(timestamp) & 0xFFFFFFFF, *values)
+        return binascii.b2a_base64(self.buffer, newline=False).decode()
@@ -0,0 +1,102 @@
+import pytest
+
+from grid_meter.services.anomaly import (AnomalyDetector, HampelFilter, Welford, EVENT_COUNTER_JUMP,
+                                         EVENT_PHASE_IMBALANCE, EVENT_SPIKE, EVENT_STUCK_REGISTER,
+                                         EVENT_VOLTAGE_SAG, EVENT_VOLTAGE_SWELL, event_names)
+
+
+@pytest.fixture
+def detector():
+    return AnomalyDetector()
+
+
+def test_welford_matches_batch_statistics():
+    values = [230.1, 229.8, 231.0, 230.4, 228.9]
+    stats = Welford()
+    for value in values:
+        stats.add(value)
+
+    mean = sum(values) / len(values)
+    assert stats.mean == pytest.approx(mean)
+    assert stats.std() == pytest.approx((sum((v - mean) ** 2 for v in values) / (len(values) - 1)) ** 0.5)
+
+
+def test_hampel_replaces_spike_by_median():
+    hampel = HampelFilter(window=5, min_scale=1.0)
+    for value in (230.0, 230.5, 229.5, 230.2, 229.8):
+        assert hampel.check(value) == (value, False)
+
+    assert hampel.check(1000.0) == (230.0, True)
+
+
+def test_hampel_accepts_step_after_half_window():
+    hampel = HampelFilter(window=5, min_scale=1.0)
+    for value in (100.0, 101.0, 99.0, 100.0, 100.0):
+        hampel.check(value)
+
+    results = [hampel.check(2100.0)[1] for _ in range(4)]
+
+    assert results == [True, True, True, False]
+
+
+def test_voltage_sag_swell_and_imbalance(detector):
+    detector.check("L1_voltage", 230.0, 0)
+    detector.check("L2_voltage", 200.0, 0)
+    assert detector.take_events() == EVENT_VOLTAGE_SAG
+
+    detector.check("L3_voltage", 255.0, 0)
+
+    assert detector.take_events() == EVENT_VOLTAGE_SWELL | EVENT_PHASE_IMBALANCE
+    assert detector.take_events() == 0
+
+
+def test_realistic_unbalanced_voltages_are_not_imbalance(detector):
+    for voltages in ((226.1, 231.4, 234.8), (233.5, 228.0, 225.9), (229.0, 236.2, 228.7)):
+        for phase, voltage in zip(("L1", "L2", "L3"), voltages):
+            detector.check(f"{phase}_voltage", voltage, 0)
+    assert detector.take_events() == 0
+
+    detector.check("L3_voltage", 218.0, 0)
+    assert detector.take_events() == EVENT_PHASE_IMBALANCE
+
+
+def test_stuck_register(detector):
+    for _ in range(11):
+        assert detector.check("L1_active_power", 1234.5, 0) == 1234.5
+    assert detector.take_events() == 0
+
+    assert detector.check("L1_active_power", 1234.5, 0) is None
+    assert detector.take_events() == EVENT_STUCK_REGISTER
+    assert detector.check("L1_active_power", 1250.0, 0) == 1250.0
+
+
+def test_zero_power_is_not_stuck(detector):
+    for _ in range(20):
+        detector.check("L2_active_power", 0.0, 0)
+
+    assert detector.take_events() == 0
+
+
+def test_garbage_reading_is_rejected(detector):
+    assert detector.check("L1_current", float("nan"), 0) is None
+    assert detector.check("L1_current", 3.4e38, 0) is None
+    assert detector.take_events() == EVENT_SPIKE
+
+
+def test_counter_jump_is_rejected_and_resynchronised(detector):
+    name = "Total_forward_active_energy"
+    assert detector.check(name, 1000.0, 0) == 1000.0
+    assert detector.check(name, 1000.5, 60) == 1000.5
+
+    assert detector.check(name, 1500.0, 120) is None
+    assert detector.check(name, 999.0, 180) is None
+    assert detector.take_events() == EVENT_COUNTER_JUMP
+    assert detector.check(name, 1000.9, 240) == 1000.9
+
+    for timestamp in range(300, 600, 60):
+        assert detector.check(name, 5000.0, timestamp) is None
+    assert detector.check(name, 5000.0, 600) == 5000.0
+
+
+def test_event_names():
+    assert event_names(EVENT_VOLTAGE_SAG | EVENT_COUNTER_JUMP) == ["voltage_sag", "counter_jump"]
@@ -0,0 +1,46 @@
+import pytest
+
+from grid_meter.services.baseline import BaselineStore, RECORD_SIZE
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BaselineStore(path=str(tmp_path / "baseline.bin"), slots=4)
+
+
+def test_load_without_file(store):
+    assert store.load() is None
+
+
+def test_save_and_load(store):
+    store.save([1000, 100], [2000, 101])
+
+    assert BaselineStore(path=store.path, slots=4).load() == [[1000, 100], [2000, 101]]
+
+
+def test_newest_record_wins_after_ring_wraps(store):
+    for i in range(10):
+        store.save([i, 100 + i], [i * 2, 100 + i])
+
+    restored = BaselineStore(path=store.path, slots=4)
+
+    assert restored.load() == [[9, 109], [18, 109]]
+    assert restored.sequence == 10
+
+
+def test_records_stay_inside_the_ring(store):
+    for i in range(10):
+        store.save([i, i], [i, i])
+
+    with open(store.path, "rb") as file:
+        assert len(file.read()) == 4 * RECORD_SIZE
+
+
+def test_corrupted_record_is_skipped(store):
+    store.save([1, 1], [1, 1])
+    store.save([2, 2], [2, 2])
+    with open(store.path, "r+b") as file:
+        file.seek(2 * RECORD_SIZE + 5)
+        file.write(b"\xff")
+
+    assert BaselineStore(path=store.path, slots=4).load() == [[1, 1], [1, 1]]
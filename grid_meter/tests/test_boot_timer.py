@@ -0,0 +1,52 @@
+import sys
+import types
+
+import pytest
+
+
+class Ticks:
+    """utime of MicroPython, ticks_ms driven by the test"""
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        return self.now
+
+    @staticmethod
+    def ticks_diff(new, old):
+        return new - old
+
+
+@pytest.fixture
+def ticks(monkeypatch):
+    ticks = Ticks()
+    utime = types.ModuleType("utime")
+    utime.ticks_ms = ticks.ticks_ms
+    utime.ticks_diff = ticks.ticks_diff
+    monkeypatch.setitem(sys.modules, "utime", utime)
+    monkeypatch.delitem(sys.modules, "grid_meter.services.boot_timer", raising=False)
+    return ticks
+
+
+def test_stages_in_order_of_first_occurrence(ticks):
+    from grid_meter.services.boot_timer import BootTimer
+    ticks.now = 1000
+    timer = BootTimer()
+    for now, stage in ((1050, "acquisition"), (4200, "wifi"), (4300, "acquisition"), (6500, "first_publish")):
+        ticks.now = now
+        timer.mark(stage)
+
+    assert list(timer.stages) == ["acquisition", "wifi", "first_publish"]
+    assert timer.stages == {"acquisition": 50, "wifi": 3200, "first_publish": 5500}
+
+
+def test_report(ticks):
+    from grid_meter.services.boot_timer import BootTimer
+    timer = BootTimer()
+    ticks.now = 80
+    timer.mark("acquisition")
+    ticks.now = 2500
+    timer.mark("first_frame")
+
+    assert timer.report() == "acquisition: 80 ms | first_frame: 2500 ms"
@@ -0,0 +1,54 @@
+import threading
+
+from grid_meter.services.frame_buffer import FrameBuffer
+
+
+def create_frame():
+    return {"L1_voltage": 0, "Total_forward_active_energy": [0, 0]}
+
+
+def test_reader_sees_published_frame_only():
+    buffer = FrameBuffer(create_frame)
+
+    back = buffer.begin()
+    back["L1_voltage"] = 230.0
+    with buffer as frame:
+        assert frame["L1_voltage"] == 0
+
+    buffer.publish()
+    with buffer as frame:
+        assert frame["L1_voltage"] == 230.0
+
+
+def test_begin_carries_over_published_values_without_sharing_lists():
+    buffer = FrameBuffer(create_frame)
+    back = buffer.begin()
+    back["Total_forward_active_energy"][0] = 100
+    buffer.publish()
+
+    back = buffer.begin()
+
+    assert back["Total_forward_active_energy"] == [100, 0]
+    assert back["Total_forward_active_energy"] is not buffer.front()["Total_forward_active_energy"]
+
+
+def test_concurrent_reader_sees_consistent_frames():
+    buffer = FrameBuffer(lambda: {"a": 0, "b": 0})
+    inconsistent = []
+
+    def reader():
+        for _ in range(20000):
+            with buffer as frame:
+                if frame["a"] != frame["b"]:
+                    inconsistent.append((frame["a"], frame["b"]))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(20000):
+        back = buffer.begin()
+        back["a"] = i
+        back["b"] = i
+        buffer.publish()
+    thread.join()
+
+    assert not inconsistent
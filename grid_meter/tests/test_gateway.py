@@ -0,0 +1,151 @@
+import socket
+import struct
+
+import pytest
+
+from grid_meter.services.gateway import (RegisterCache, ModbusGateway, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS,
+                                         ILLEGAL_DATA_ADDRESS, ILLEGAL_FUNCTION, TARGET_FAILED)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache():
+    cache = RegisterCache()
+    cache.store(1, 14, struct.pack(">ff", 230.5, 231.0), 100)
+    return cache
+
+
+@pytest.fixture
+def gateway(cache, clock):
+    refreshed = []
+
+    def refresh(slave_addr, start, count):
+        refreshed.append((slave_addr, start, count))
+        return slave_addr == 1
+
+    gateway = ModbusGateway(cache, refresh, clock, port=0, max_age=10, timeout=5)
+    gateway.refreshed = refreshed
+    return gateway
+
+
+def test_cache_hit_without_bus_read(gateway):
+    response = gateway.request(1, READ_HOLDING_REGISTERS, 14, 4)
+
+    assert response == struct.pack(">BB", 3, 8) + struct.pack(">ff", 230.5, 231.0)
+    assert gateway.refreshed == []
+
+
+def test_stale_registers_coalesced_into_one_refresh(gateway, cache, clock):
+    clock.now = 111
+
+    assert gateway.request(1, READ_HOLDING_REGISTERS, 14, 2, "a", 1) is None
+    assert gateway.request(1, READ_HOLDING_REGISTERS, 14, 2, "b", 7) is None
+
+    assert gateway.refreshed == [(1, 14, 2)]
+    assert gateway.stats["coalesced"] == 1
+    sent = []
+    gateway.clients = {"a": b"", "b": b""}
+    gateway.send = lambda client, transaction, unit, pdu: sent.append((client, transaction, pdu))
+    cache.store(1, 14, struct.pack(">f", 229.0), 111)
+    gateway.answer_pending()
+
+    assert [(client, transaction) for client, transaction, _ in sent] == [("a", 1), ("b", 7)]
+    assert sent[0][2] == struct.pack(">BB", 3, 4) + struct.pack(">f", 229.0)
+    assert gateway.pending == {}
+
+
+def test_contained_and_overlapping_requests_share_the_bus_read(gateway, cache, clock):
+    clock.now = 111
+    sent = []
+    gateway.clients = {"a": b"", "b": b"", "c": b""}
+    gateway.send = lambda client, transaction, unit, pdu: sent.append((client, pdu))
+
+    assert gateway.request(1, READ_HOLDING_REGISTERS, 14, 4, "a", 1) is None
+    assert gateway.request(1, READ_HOLDING_REGISTERS, 16, 2, "b", 2) is None
+    assert gateway.request(1, READ_HOLDING_REGISTERS, 16, 4, "c", 3) is None
+
+    assert gateway.refreshed == [(1, 14, 4), (1, 18, 2)]
+    assert gateway.stats["coalesced"] == 1
+    cache.store(1, 14, struct.pack(">fff", 229.0, 230.0, 231.0), 111)
+    gateway.answer_pending()
+
+    assert dict(sent) == {
+        "a": struct.pack(">BB", 3, 8) + struct.pack(">ff", 229.0, 230.0),
+        "b": struct.pack(">BB", 3, 4) + struct.pack(">f", 230.0),
+        "c": struct.pack(">BB", 3, 8) + struct.pack(">ff", 230.0, 231.0)
+    }
+
+
+def test_pending_request_times_out(gateway, clock):
+    clock.now = 111
+    gateway.request(1, READ_HOLDING_REGISTERS, 14, 2, "a", 1)
+    sent = []
+    gateway.clients = {"a": b""}
+    gateway.send = lambda client, transaction, unit, pdu: sent.append(pdu)
+
+    clock.now = 116
+    gateway.answer_pending()
+
+    assert sent == [struct.pack(">BB", 0x83, TARGET_FAILED)]
+    assert gateway.stats["timeouts"] == 1
+
+
+def test_unknown_registers(gateway):
+    assert gateway.request(2, READ_HOLDING_REGISTERS, 14, 2) == struct.pack(">BB", 0x83, ILLEGAL_DATA_ADDRESS)
+
+
+def test_input_registers_hold_age_of_values(gateway, clock):
+    clock.now = 103
+
+    response = gateway.request(1, READ_INPUT_REGISTERS, 14, 5)
+
+    assert response == struct.pack(">BB", 4, 10) + struct.pack(">HHHHH", 3, 3, 3, 3, 0xFFFF)
+
+
+def test_modbus_tcp_client(gateway):
+    gateway.start()
+    port = gateway.server.getsockname()[1]
+    client = socket.create_connection(("127.0.0.1", port), timeout=5)
+    try:
+        client.sendall(struct.pack(">HHHBBHH", 42, 0, 6, 1, READ_HOLDING_REGISTERS, 14, 2))
+        header = b""
+        for _ in range(100):
+            gateway.poll()
+            try:
+                client.settimeout(0.01)
+                header += client.recv(64)
+            except socket.timeout:
+                continue
+            if len(header) >= 13:
+                break
+    finally:
+        client.close()
+        gateway.server.close()
+
+    assert struct.unpack(">HHHBBB", header[:9]) == (42, 0, 7, 1, 3, 4)
+    assert struct.unpack(">f", header[9:13])[0] == pytest.approx(230.5)
+
+
+def test_write_request_gets_illegal_function_and_keeps_connection(gateway):
+    sent = []
+    gateway.clients = {"a": b""}
+    gateway.send = lambda client, transaction, unit, pdu: sent.append((transaction, pdu))
+    write_multiple = struct.pack(">HHHBBHHBHH", 5, 0, 11, 1, 0x10, 14, 2, 4, 1, 2)
+
+    gateway.handle("a", write_multiple)
+    gateway.handle("a", struct.pack(">HHHBBHH", 6, 0, 6, 1, 0x06, 14, 1))
+
+    assert sent == [(5, struct.pack(">BB", 0x90, ILLEGAL_FUNCTION)), (6, struct.pack(">BB", 0x86, ILLEGAL_FUNCTION))]
+    assert "a" in gateway.clients
@@ -0,0 +1,77 @@
+from grid_meter.services.heartbeat import Heartbeat
+
+
+def test_heartbeat_only_on_quiet_link():
+    heartbeat = Heartbeat(timeout=60, quiet_fraction=0.3, now=0)
+
+    assert heartbeat.due(0)
+    assert not heartbeat.due(10)
+    heartbeat.sent(15)
+    assert not heartbeat.due(30)
+    assert heartbeat.due(33)
+
+
+def test_traffic_cut_by_order_of_magnitude():
+    heartbeat = Heartbeat(timeout=60, quiet_fraction=0.3, now=0)
+
+    sent = sum(heartbeat.due(second) for second in range(3600))
+
+    assert sent <= 3600 / 18 + 1
+
+
+def test_alive_from_any_message():
+    heartbeat = Heartbeat(timeout=60, now=0)
+
+    heartbeat.received(50)
+
+    assert heartbeat.alive(109)
+    assert not heartbeat.alive(110)
+
+
+def test_late_arrivals_shorten_interval():
+    heartbeat = Heartbeat(timeout=60, quiet_fraction=0.3, now=0)
+    now = 0
+    for _ in range(5):
+        now += 18
+        heartbeat.received(now)
+    assert heartbeat.interval() == 18
+
+    for _ in range(5):
+        now += 25
+        heartbeat.received(now)
+
+    assert 1 <= heartbeat.interval() < 18
+
+
+def test_min_interval_on_very_slow_link():
+    heartbeat = Heartbeat(timeout=60, quiet_fraction=0.3, min_interval=2, now=0)
+    heartbeat.received(1)
+
+    heartbeat.received(59)
+
+    assert heartbeat.interval() == 2
+
+
+def test_first_delay_and_outage_are_ignored():
+    heartbeat = Heartbeat(timeout=10, quiet_fraction=0.3, now=0)
+
+    heartbeat.received(50000)
+    assert heartbeat.interval() == 3
+    heartbeat.received(50100)
+    assert heartbeat.interval() == 3
+    assert heartbeat.alive(50105)
+
+
+def test_ticks_wrap_around():
+    period = 1 << 30
+
+    def ticks_elapsed(now, then):
+        return ((now - then + period // 2) % period - period // 2) / 1000
+
+    heartbeat = Heartbeat(timeout=10, quiet_fraction=0.3, now=period - 1000, elapsed=ticks_elapsed)
+
+    heartbeat.received(period - 500)
+    assert heartbeat.alive(2000)
+    assert not heartbeat.alive(9500)
+    assert heartbeat.due(2000)
+    assert not heartbeat.due(4000)
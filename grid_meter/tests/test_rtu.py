@@ -0,0 +1,126 @@
+import sys
+import types
+
+import pytest
+
+
+class Ticks:
+    """utime of MicroPython, sleep_ms advances ticks_ms"""
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        return self.now
+
+    @staticmethod
+    def ticks_diff(new, old):
+        return new - old
+
+    def sleep_ms(self, ms):
+        self.now += ms
+
+
+class Uart:
+    """RS-485 bus with a slave answering every request with the next scripted response, in chunks"""
+
+    def __init__(self, responses, chunk=4):
+        self.responses = list(responses)
+        self.chunk = chunk
+        self.requests = []
+        self.pending = b""
+
+    def write(self, request):
+        self.requests.append(bytes(request))
+        self.pending = self.responses.pop(0) if self.responses else b""
+
+    def any(self):
+        return len(self.pending)
+
+    def read(self):
+        data, self.pending = self.pending[:self.chunk], self.pending[self.chunk:]
+        return data
+
+
+@pytest.fixture
+def rtu(monkeypatch):
+    ticks = Ticks()
+    utime = types.ModuleType("utime")
+    utime.ticks_ms = ticks.ticks_ms
+    utime.ticks_diff = ticks.ticks_diff
+    utime.sleep_ms = ticks.sleep_ms
+    monkeypatch.setitem(sys.modules, "utime", utime)
+    monkeypatch.delitem(sys.modules, "grid_meter.services.rtu", raising=False)
+    from grid_meter.services import rtu
+    return rtu
+
+
+def frame(rtu, body):
+    return bytes(body) + rtu.calculate_crc(bytes(body))
+
+
+def test_crc_of_known_request(rtu):
+    # read 1 holding register at 0 from slave 1: 01 03 00 00 00 01 84 0A
+    assert rtu.calculate_crc(bytes([0x01, 0x03, 0x00, 0x00, 0x00, 0x01])) == bytes([0x84, 0x0A])
+
+
+def test_good_frame(rtu):
+    response = frame(rtu, [0x01, 0x03, 0x04, 0x43, 0x66, 0x80, 0x00])
+    uart = Uart([response])
+
+    assert rtu.modbus_request(uart, slave_addr=1, register_addr=30, num_registers=2) == response
+    assert uart.requests == [frame(rtu, [0x01, 0x03, 0x00, 0x1E, 0x00, 0x02])]
+
+
+def test_bad_crc_is_retried(rtu):
+    response = frame(rtu, [0x01, 0x03, 0x02, 0x12, 0x34])
+    corrupted = response[:-1] + bytes([response[-1] ^ 0xFF])
+    uart = Uart([corrupted, response])
+
+    assert not rtu.is_valid_response(corrupted, 1, 0x03)
+    assert rtu.modbus_request(uart, slave_addr=1, register_addr=0, num_registers=1) == response
+    assert len(uart.requests) == 2
+
+
+def test_bad_crc_on_every_attempt(rtu):
+    response = frame(rtu, [0x01, 0x03, 0x02, 0x12, 0x34])
+    corrupted = response[:-2] + b"\x00\x00"
+    uart = Uart([corrupted] * 3)
+
+    assert rtu.modbus_request(uart, slave_addr=1, register_addr=0, num_registers=1, attempts=3) == b""
+    assert len(uart.requests) == 3
+
+
+def test_exception_response_is_not_retried(rtu):
+    # illegal data address
+    exception = frame(rtu, [0x01, 0x83, 0x02])
+    uart = Uart([exception, frame(rtu, [0x01, 0x03, 0x02, 0x12, 0x34])])
+
+    assert not rtu.is_valid_response(exception, 1, 0x03)
+    assert rtu.is_exception_response(exception, 1, 0x03)
+    assert rtu.modbus_request(uart, slave_addr=1, register_addr=9999, num_registers=1) == b""
+    assert len(uart.requests) == 1
+
+
+def test_exception_response_does_not_wait_for_timeout(rtu):
+    uart = Uart([frame(rtu, [0x01, 0x83, 0x02])])
+    uart.write(b"")
+
+    rtu.read_response(uart, timeout_ms=1000)
+
+    assert rtu.utime.ticks_ms() < 1000
+
+
+def test_short_read(rtu):
+    response = frame(rtu, [0x01, 0x03, 0x04, 0x43, 0x66, 0x80, 0x00])
+    uart = Uart([response[:6]] * 2)
+
+    assert not rtu.is_valid_response(response[:6], 1, 0x03)
+    assert rtu.modbus_request(uart, slave_addr=1, register_addr=30, num_registers=2, attempts=2, timeout_ms=50) == b""
+    assert len(uart.requests) == 2
+
+
+def test_response_from_other_slave(rtu):
+    response = frame(rtu, [0x02, 0x03, 0x02, 0x12, 0x34])
+
+    assert not rtu.is_valid_response(response, 1, 0x03)
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from grid_meter.services.scheduler import Register, PollScheduler, interleave
+
+
+@pytest.fixture
+def scheduler():
+    registers = [
+        Register("L1_voltage", 14, period=60, priority=0),
+        Register("L2_voltage", 16, period=60, priority=0),
+        Register("L1_active_power", 30, period=5, priority=2),
+        Register("L2_active_power", 32, period=5, priority=2),
+        Register("Total_forward_active_energy", 264, period=60, priority=1, aligned=True),
+    ]
+    return PollScheduler(registers, max_gap=2)
+
+
+def test_first_cycle_reads_all_registers(scheduler):
+    blocks = scheduler.due(now=0)
+    names = [register.name for block in blocks for register in block.registers]
+
+    assert sorted(names) == sorted(register.name for register in scheduler.registers)
+
+
+def test_adjacent_registers_are_coalesced(scheduler):
+    blocks = scheduler.due(now=0)
+    starts = {block.start: block.count for block in blocks}
+
+    assert starts == {14: 4, 30: 4, 264: 2}
+    assert [block.start for block in blocks] == [30, 264, 14]  # ordered by priority
+
+
+def test_block_offsets(scheduler):
+    block = [block for block in scheduler.due(now=0) if block.start == 30][0]
+
+    assert [block.offset(register) for register in block.registers] == [0, 4]
+
+
+def test_registers_polled_at_own_period(scheduler):
+    for block in scheduler.due(now=0):
+        scheduler.mark_read(block, 0)
+
+    blocks = scheduler.due(now=5)
+    assert [register.name for block in blocks for register in block.registers] == ["L1_active_power",
+                                                                                   "L2_active_power"]
+    assert scheduler.next_due() == 5
+
+
+def test_aligned_register_due_on_period_boundary(scheduler):
+    energy = scheduler.registers[-1]
+    block = [block for block in scheduler.due(now=0) if block.start == 264][0]
+
+    scheduler.mark_read(block, 75)
+
+    assert energy.next_due == 120
+
+
+def test_gap_and_count_limits_split_blocks():
+    registers = [Register("a", 0, 1), Register("b", 2, 1), Register("c", 10, 1)]
+
+    assert len(PollScheduler(registers, max_gap=0).due(0)) == 2
+    assert len(PollScheduler(registers, max_gap=6).due(0)) == 1
+    assert len(PollScheduler(registers, max_gap=6, max_count=4).due(0)) == 2
+
+
+def test_force_makes_register_due(scheduler):
+    for block in scheduler.due(now=0):
+        scheduler.mark_read(block, 0)
+
+    scheduler.force(["L1_voltage"])
+
+    blocks = scheduler.due(now=1)
+    assert [register.name for block in blocks for register in block.registers] == ["L1_voltage"]
+
+
+def test_interleave_round_robin_over_slaves():
+    requests = interleave([["a1", "a2", "a3"], [], ["c1"]])
+
+    assert requests == [(0, "a1"), (2, "c1"), (0, "a2"), (0, "a3")]
+
+
+def test_force_waits_for_lock_held_by_acquisition(scheduler):
+    for block in scheduler.due(now=0):
+        scheduler.mark_read(block, 0)
+    scheduler._lock.acquire()
+    thread = threading.Thread(target=scheduler.force, args=(["L1_voltage"],))
+    thread.start()
+    thread.join(0.05)
+
+    assert thread.is_alive()
+    assert scheduler.registers[0].next_due == 60
+    scheduler._lock.release()
+    thread.join()
+    assert [register.name for block in scheduler.due(now=1) for register in block.registers] == ["L1_voltage"]
@@ -0,0 +1,40 @@
+import base64
+import struct
+
+from grid_meter.services.wire import FrameEncoder, WIRE_FORMAT, WIRE_SIZE, WIRE_VERSION
+
+FRAME = {
+    "L1_voltage": 230.12, "L2_voltage": 229.87, "L3_voltage": 231.5,
+    "L1_current": 4.35, "L2_current": 0.0, "L3_current": 12.07,
+    "L1_active_power": 980.4, "L2_active_power": -1500.6, "L3_active_power": 2700.0
+}
+
+
+def test_encode_packs_scaled_values():
+    payload = FrameEncoder(boot_id=7).encode(FRAME, 1700000000)
+
+    values = struct.unpack(WIRE_FORMAT, base64.b64decode(payload))
+
+    assert values == (WIRE_VERSION, 7, 1, 1700000000, 23012, 22987, 23150, 435, 0, 1207, 980, -1501, 2700)
+
+
+def test_payload_is_several_times_smaller_than_text_frame():
+    payload = FrameEncoder().encode(FRAME, 0)
+    text = "".join(f"{key}:{value};" for key, value in FRAME.items())
+
+    assert len(payload) == 36
+    assert WIRE_SIZE == 27
+    assert len(text) / len(payload) > 4
+
+
+def test_sequence_wraps_and_values_saturate():
+    encoder = FrameEncoder()
+    encoder.sequence = 0xFFFF
+    frame = dict(FRAME, L1_active_power=50000.0, L1_current=-400.0, L1_voltage=-1.0)
+
+    values = struct.unpack(WIRE_FORMAT, base64.b64decode(encoder.encode(frame, 0)))
+
+    assert values[2] == 0
+    assert values[4] == 0
+    assert values[7] == -0x8000
+    assert values[10] == 0x7FFF